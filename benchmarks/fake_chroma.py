@@ -0,0 +1,134 @@
+"""
+Fake Chroma server for benchmarks.
+
+Loads the bootstrap service descriptions (`chroma-agents/bootstrap/agents`),
+embeds them with the fake LLM's embedding function and serves the subset of
+the Chroma v1 HTTP API the coordinator uses: collection listing, `query`
+(brute-force cosine distance) and `get`. Service endpoints can be pointed at
+local ports, e.g. `FAKE_CHROMA_HOSTS="customer-service:8000=127.0.0.1:18101"`.
+"""
+from typing import Any, Dict, List
+
+import json
+import os
+import sys
+
+import numpy as np
+from fastapi import FastAPI, HTTPException
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_llm import embed, simulate  # noqa: E402
+
+
+# ── config ───────────────────────────────────────────────────────────────────────
+FAKE_CHROMA_DOCS       = os.getenv("FAKE_CHROMA_DOCS", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "chroma-agents", "bootstrap", "agents"))
+FAKE_CHROMA_COLLECTION = os.getenv("FAKE_CHROMA_COLLECTION", "services")
+# comma-separated "host:port=host:port" rewrites applied to metadata endpoints
+FAKE_CHROMA_HOSTS      = os.getenv("FAKE_CHROMA_HOSTS", "")
+FAKE_CHROMA_LATENCY    = float(os.getenv("FAKE_CHROMA_LATENCY", "0.005"))
+# ────────────────────────────────────────────────────────────────────────────────
+
+COLLECTION_ID = "bench-" + FAKE_CHROMA_COLLECTION
+
+app = FastAPI()
+
+
+def flatten_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    # Same shape bootstrap_chroma.py stores: nested dicts inlined, lists comma-joined
+    flat: Dict[str, Any] = {}
+    for key, value in metadata.items():
+        if isinstance(value, dict):
+            flat.update(value)
+        elif isinstance(value, list):
+            flat[key] = ",".join(map(str, value))
+        else:
+            flat[key] = value
+    return flat
+
+
+def rewrite_endpoint(endpoint: str, hosts: Dict[str, str]) -> str:
+    for old, new in hosts.items():
+        endpoint = endpoint.replace(f"//{old}/", f"//{new}/")
+    return endpoint
+
+
+def load_collection(path: str, hosts: Dict[str, str]):
+    ids: List[str] = []
+    documents: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+    for name in sorted(os.listdir(path)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(path, name), encoding="utf-8") as f:
+            doc = json.load(f)
+        metadata = flatten_metadata(doc.get("metadata", {}))
+        if "endpoint" in metadata:
+            metadata["endpoint"] = rewrite_endpoint(metadata["endpoint"], hosts)
+        ids.append(doc.get("id") or os.path.splitext(name)[0])
+        documents.append(doc["document"])
+        metadatas.append(metadata)
+    embeddings = np.array([embed(d) for d in documents], dtype=np.float32)
+    return ids, documents, metadatas, embeddings
+
+
+hosts = dict(pair.split("=", 1) for pair in FAKE_CHROMA_HOSTS.split(",") if "=" in pair)
+ids, documents, metadatas, embeddings = load_collection(FAKE_CHROMA_DOCS, hosts)
+
+
+def check_collection(collection_id: str) -> None:
+    if collection_id != COLLECTION_ID:
+        raise HTTPException(404, detail=f"collection {collection_id} does not exist")
+
+
+@app.get("/api/v1/heartbeat")
+async def heartbeat():
+    return {"nanosecond heartbeat": 0}
+
+
+@app.get("/api/v1/collections")
+async def list_collections():
+    await simulate(FAKE_CHROMA_LATENCY)
+    return [{"name": FAKE_CHROMA_COLLECTION, "id": COLLECTION_ID, "metadata": None}]
+
+
+@app.post("/api/v1/collections/{collection_id}/query")
+async def query(collection_id: str, body: Dict):
+    check_collection(collection_id)
+    queries = np.array(body.get("query_embeddings", []), dtype=np.float32)
+    k = min(int(body.get("n_results", 10)), len(ids))
+    include = body.get("include", ["documents", "metadatas", "distances"])
+    await simulate(FAKE_CHROMA_LATENCY)
+
+    if not len(queries):
+        return {"ids": [], "documents": [], "metadatas": [], "distances": []}
+    norms = np.linalg.norm(queries, axis=1, keepdims=True)
+    distances = 1.0 - (queries / np.where(norms == 0, 1, norms)) @ embeddings.T
+    top = np.argsort(distances, axis=1)[:, :k]
+
+    result: Dict[str, Any] = {"ids": [[ids[i] for i in row] for row in top]}
+    if "documents" in include:
+        result["documents"] = [[documents[i] for i in row] for row in top]
+    if "metadatas" in include:
+        result["metadatas"] = [[metadatas[i] for i in row] for row in top]
+    if "distances" in include:
+        result["distances"] = [[float(distances[n, i]) for i in row] for n, row in enumerate(top)]
+    return result
+
+
+@app.post("/api/v1/collections/{collection_id}/get")
+async def get(collection_id: str, body: Dict):
+    check_collection(collection_id)
+    wanted = body.get("ids")
+    include = body.get("include", ["documents", "metadatas"])
+    await simulate(FAKE_CHROMA_LATENCY)
+
+    rows = [i for i, pid in enumerate(ids) if wanted is None or pid in wanted]
+    result: Dict[str, Any] = {"ids": [ids[i] for i in rows]}
+    if "documents" in include:
+        result["documents"] = [documents[i] for i in rows]
+    if "metadatas" in include:
+        result["metadatas"] = [metadatas[i] for i in rows]
+    if "embeddings" in include:
+        result["embeddings"] = [embeddings[i].tolist() for i in rows]
+    return result
@@ -0,0 +1,185 @@
+"""
+Fake OpenAI-compatible LLM server for benchmarks.
+
+Serves `/v1/embeddings` and `/v1/chat/completions` without a model: embeddings
+are hashed bags of words (so similar texts land close together), and chat
+completions answer the coordinator's rerank, extraction and planner prompts
+with rule-based JSON. Every reply includes a `usage` block. Latency is
+simulated with `asyncio.sleep`, so one process can hold many concurrent
+requests the way a real inference server queues them.
+"""
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+
+from fastapi import FastAPI
+
+
+# ── config ───────────────────────────────────────────────────────────────────────
+# simulated latency per call (seconds) and relative +/- jitter
+FAKE_LLM_CHAT_LATENCY  = float(os.getenv("FAKE_LLM_CHAT_LATENCY", "0.25"))
+FAKE_LLM_EMBED_LATENCY = float(os.getenv("FAKE_LLM_EMBED_LATENCY", "0.02"))
+FAKE_LLM_JITTER        = float(os.getenv("FAKE_LLM_JITTER", "0.1"))
+FAKE_LLM_EMBED_DIM     = int(os.getenv("FAKE_LLM_EMBED_DIM", "384"))
+FAKE_LLM_SEED          = int(os.getenv("FAKE_LLM_SEED", "0"))
+# ────────────────────────────────────────────────────────────────────────────────
+
+app = FastAPI()
+rng = random.Random(FAKE_LLM_SEED)
+
+
+async def simulate(latency: float) -> None:
+    if latency > 0:
+        await asyncio.sleep(latency * (1 + rng.uniform(-FAKE_LLM_JITTER, FAKE_LLM_JITTER)))
+
+
+def tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def embed(text: str, dim: int = FAKE_LLM_EMBED_DIM) -> List[float]:
+    """Deterministic unit vector: each word adds +/-1 to a hashed dimension."""
+    vector = [0.0] * dim
+    for word in re.findall(r"\w+", text.lower()):
+        h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big")
+        vector[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+# ── rule-based extraction ────────────────────────────────────────────────────────
+
+LOCATIONS = {"munich": "MUC", "münchen": "MUC", "muc": "MUC", "berlin": "BER", "hamburg": "HAM"}
+VEHICLES = {"suv": "SUV", "sedan": "Sedan", "golf": "Golf", "van": "Van", "truck": "Truck"}
+TIERS = ("platinum", "gold", "premium", "basic")
+MONTHS = {m: i for i, m in enumerate(
+    ("january", "february", "march", "april", "may", "june", "july",
+     "august", "september", "october", "november", "december"), start=1)}
+BENCH_YEAR = 2025
+
+
+def find_dates(text: str) -> List[str]:
+    found = re.findall(r"\b\d{4}-\d{2}-\d{2}\b", text)
+    for month, day in re.findall(r"\b(" + "|".join(MONTHS) + r")\s+(\d{1,2})\b", text.lower()):
+        found.append(date(BENCH_YEAR, MONTHS[month], int(day)).isoformat())
+    return found
+
+
+def extract_fields(text: str, properties: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Values the request states explicitly, restricted to `properties` (null when absent)."""
+    lower = text.lower()
+    fields: Dict[str, Any] = {}
+
+    m = re.search(r"\b(?:user|customer)\s+(\d+)\b", lower)
+    if m:
+        fields["customer_id"] = int(m.group(1))
+    for word in re.findall(r"\w+", lower):
+        if word in LOCATIONS and "location" not in fields:
+            fields["location"] = LOCATIONS[word]
+        if word in VEHICLES and "vehicle_type" not in fields:
+            fields["vehicle_type"] = VEHICLES[word]
+        if word in TIERS and "customer_tier" not in fields:
+            fields["customer_tier"] = word
+
+    dates = find_dates(text)
+    if len(dates) >= 2:
+        fields["start_date"], fields["end_date"] = dates[0], dates[1]
+        fields["days"] = max(1, (date.fromisoformat(dates[1]) - date.fromisoformat(dates[0])).days)
+
+    if properties is None:
+        return fields
+    return {k: fields.get(k) for k in properties}
+
+
+def first_json_object(text: str) -> Dict[str, Any]:
+    start = text.find("{")
+    while start != -1:
+        try:
+            value, _ = json.JSONDecoder().raw_decode(text, start)
+            if isinstance(value, dict):
+                return value
+        except json.JSONDecodeError:
+            pass
+        start = text.find("{", start + 1)
+    return {}
+
+
+def user_request(prompt: str) -> str:
+    m = re.search(r"User request:\s*(.*?)\s*\n\s*\n", prompt, re.S)
+    return m.group(1) if m else prompt
+
+
+def candidate_ids(prompt: str) -> List[str]:
+    # build_candidates_section(): "<id>:" on its own line, then indented details
+    return re.findall(r"^([\w.-]+):\s*$", prompt, re.M)
+
+
+def answer(messages: List[Dict[str, str]], response_format: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    user = next((m["content"] for m in messages if m.get("role") == "user"), "")
+
+    if "strict JSON extractor" in system:
+        schema = first_json_object(system)
+        return extract_fields(user, schema.get("properties"))
+
+    ids = candidate_ids(user)
+    reasons = {pid: "matches the request (benchmark stub)" for pid in ids}
+    if "service planner" in system:
+        schema = (response_format or {}).get("json_schema", {}).get("schema") or first_json_object(system)
+        properties = schema.get("properties", {}).get("fields", {}).get("properties")
+        return {"pickids": ids, "order": ids, "reasons": reasons, "fields": extract_fields(user_request(user), properties)}
+    return {"pickids": ids, "order": ids, "reasons": reasons}
+
+
+# ── endpoints ────────────────────────────────────────────────────────────────────
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "fake-chat", "object": "model"}, {"id": "fake-embed", "object": "model"}]}
+
+
+@app.post("/v1/embeddings")
+async def embeddings(body: Dict):
+    inputs = body.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    await simulate(FAKE_LLM_EMBED_LATENCY)
+    prompt_tokens = sum(tokens(t) for t in inputs)
+    return {
+        "object": "list",
+        "model": body.get("model", "fake-embed"),
+        "data": [{"object": "embedding", "index": i, "embedding": embed(t)} for i, t in enumerate(inputs)],
+        "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(body: Dict):
+    messages = body.get("messages", [])
+    content = json.dumps(answer(messages, body.get("response_format")))
+    await simulate(FAKE_LLM_CHAT_LATENCY)
+    prompt_tokens = sum(tokens(m.get("content", "")) for m in messages)
+    completion_tokens = tokens(content)
+    return {
+        "object": "chat.completion",
+        "model": body.get("model", "fake-chat"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
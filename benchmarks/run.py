@@ -0,0 +1,395 @@
+"""
+Reproducible coordinator benchmark.
+
+Starts the fake LLM and fake Chroma (see `fake_llm.py`, `fake_chroma.py`),
+the fixture services and the coordinator as local uvicorn processes, then
+replays the sentences from `exampleSentence.md` against `/api/search`,
+`/api/rerank` and `/api/dispatch` at a fixed concurrency. Reports
+throughput, p50/p95/p99 latency per endpoint and the per-stage breakdown
+scraped from the coordinator's `/metrics`. Needs no network access.
+
+    python benchmarks/run.py --requests 200 --concurrency 16
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, "benchmarks")
+FIXTURES = ("customer-service", "insurance-service", "pricing-service", "rental-service")
+SCENARIOS = ("search", "rerank", "dispatch")
+
+
+# ── processes ────────────────────────────────────────────────────────────────────
+
+class Stack:
+    """The coordinator and its dependencies as local uvicorn processes."""
+
+    def __init__(self, args: argparse.Namespace, workdir: str):
+        self.args = args
+        self.workdir = workdir
+        self.procs: List[Tuple[str, subprocess.Popen, str]] = []
+        port = args.port_base
+        self.llm_port, self.chroma_port, self.coordinator_port = port, port + 1, port + 2
+        self.fixture_ports = {name: port + 10 + i for i, name in enumerate(FIXTURES)}
+
+    @property
+    def coordinator_url(self) -> str:
+        return f"http://127.0.0.1:{self.coordinator_port}"
+
+    def base_env(self) -> Dict[str, str]:
+        env = dict(os.environ)
+        env.update({
+            "PYTHONPATH": ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+            "TRACE_LOG_PATH": os.path.join(self.workdir, "trace.log"),
+            "TRACE_DB_PATH": os.path.join(self.workdir, "trace.db"),
+        })
+        return env
+
+    def start(self, name: str, app: str, port: int, cwd: str, env: Dict[str, str], workers: int = 1) -> None:
+        log_path = os.path.join(self.workdir, f"{name}.log")
+        with open(log_path, "wb") as log:
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port),
+                 "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+                cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT,
+            )
+        self.procs.append((name, proc, log_path))
+
+    def up(self) -> None:
+        args = self.args
+        env = self.base_env()
+
+        llm_env = dict(env, FAKE_LLM_CHAT_LATENCY=str(args.llm_latency),
+                       FAKE_LLM_EMBED_LATENCY=str(args.embed_latency), FAKE_LLM_SEED=str(args.seed))
+        self.start("fake-llm", "fake_llm:app", self.llm_port, BENCH_DIR, llm_env)
+
+        hosts = ",".join(f"{name}:8000=127.0.0.1:{port}" for name, port in self.fixture_ports.items())
+        chroma_env = dict(llm_env, FAKE_CHROMA_HOSTS=hosts, FAKE_CHROMA_LATENCY=str(args.chroma_latency))
+        self.start("fake-chroma", "fake_chroma:app", self.chroma_port, BENCH_DIR, chroma_env)
+
+        for name, port in self.fixture_ports.items():
+            self.start(name, "main:app", port, os.path.join(ROOT, "fixtures", name), env)
+
+        coordinator_env = dict(
+            env,
+            LMSTUDIO_URL=f"http://127.0.0.1:{self.llm_port}",
+            CHROMA_AGENTS_URL=f"http://127.0.0.1:{self.chroma_port}",
+            SEARCH_BACKEND=args.search_backend,
+            DISPATCH_MODE=args.dispatch_mode,
+            # fake_chroma scores by cosine distance
+            CHROMA_DISTANCE_METRIC="cosine",
+        )
+        if args.cold:
+            coordinator_env.update(RERANK_CACHE_BACKEND="off", EMBED_CACHE_SIZE="0")
+        elif args.workers > 1:
+            cache_dir = os.path.join(self.workdir, "cache")
+            coordinator_env.update(
+                EMBED_CACHE_BACKEND="shared", EMBED_CACHE_DB_PATH=os.path.join(cache_dir, "embeddings.sqlite"),
+                RERANK_CACHE_BACKEND="shared", RERANK_CACHE_PATH=os.path.join(cache_dir, "decisions.sqlite"),
+            )
+        self.start("coordinator", "coordinator_agent.main:app", self.coordinator_port, ROOT, coordinator_env,
+                   workers=args.workers)
+
+        self.wait_ready()
+
+    def wait_ready(self, timeout: float = 30.0) -> None:
+        probes = [f"http://127.0.0.1:{self.llm_port}/health",
+                  f"http://127.0.0.1:{self.chroma_port}/api/v1/heartbeat",
+                  f"{self.coordinator_url}/metrics"]
+        probes += [f"http://127.0.0.1:{port}/openapi.json" for port in self.fixture_ports.values()]
+        deadline = time.monotonic() + timeout
+        with httpx.Client(timeout=1.0) as client:
+            for url in probes:
+                while True:
+                    self.check_alive()
+                    try:
+                        if client.get(url).status_code == 200:
+                            break
+                    except httpx.TransportError:
+                        pass
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"timed out waiting for {url}")
+                    time.sleep(0.1)
+
+    def check_alive(self) -> None:
+        for name, proc, log_path in self.procs:
+            if proc.poll() is not None:
+                with open(log_path, encoding="utf-8", errors="replace") as f:
+                    tail = f.read()[-2000:]
+                raise RuntimeError(f"{name} exited with {proc.returncode}:\n{tail}")
+
+    def down(self) -> None:
+        for _, proc, _ in self.procs:
+            if proc.poll() is None:
+                proc.terminate()
+        for _, proc, _ in self.procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+# ── workload ─────────────────────────────────────────────────────────────────────
+
+def load_sentences(path: str) -> List[str]:
+    """The ```text blocks of exampleSentence.md."""
+    with open(path, encoding="utf-8") as f:
+        return [s.strip() for s in re.findall(r"```text\s*\n(.*?)\n```", f.read(), re.S) if s.strip()]
+
+
+def as_candidates(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Search hits carry no document; describe them the way the frontend does
+    return [
+        {**hit, "document": hit.get("document")
+            or f"Provides: {hit['metadata'].get('provides') or 'unknown'} — Tags: {hit['metadata'].get('tags') or 'none'}"}
+        for hit in hits
+    ]
+
+
+async def candidates_for(client: httpx.AsyncClient, sentences: List[str], k: int) -> Dict[str, List[Dict[str, Any]]]:
+    out = {}
+    for sentence in sentences:
+        r = await client.get("/api/search", params={"q": sentence, "k": k})
+        r.raise_for_status()
+        out[sentence] = as_candidates(r.json())
+    return out
+
+
+def request_for(scenario: str, sentence: str, candidates: Dict[str, List[Dict[str, Any]]], k: int):
+    if scenario == "search":
+        return "GET", "/api/search", {"params": {"q": sentence, "k": k}}
+    body = {"query": sentence, "candidates": candidates[sentence]}
+    return "POST", f"/api/{scenario}", {"json": body}
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    scenario: str,
+    sentences: List[str],
+    candidates: Dict[str, List[Dict[str, Any]]],
+    requests: int,
+    concurrency: int,
+    k: int,
+) -> Tuple[List[float], Dict[str, int], float]:
+    """
+    Send `requests` requests from `concurrency` workers. Returns the
+    latencies, the outcome counts ("ok", "rejected" for 4xx such as the
+    under-specified sentence, "errors" for 5xx and transport failures) and
+    the wall time.
+    """
+    feed = itertools.islice(itertools.cycle(sentences), requests)
+    latencies: List[float] = []
+    outcomes = {"ok": 0, "rejected": 0, "errors": 0}
+
+    async def worker() -> None:
+        for sentence in feed:
+            method, path, kwargs = request_for(scenario, sentence, candidates, k)
+            start = time.perf_counter()
+            try:
+                status = (await client.request(method, path, **kwargs)).status_code
+            except httpx.HTTPError:
+                status = 0
+            latencies.append(time.perf_counter() - start)
+            outcome = "ok" if 200 <= status < 300 else "rejected" if 400 <= status < 500 else "errors"
+            outcomes[outcome] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return latencies, outcomes, time.perf_counter() - started
+
+
+# ── metrics ──────────────────────────────────────────────────────────────────────
+
+SERIES = re.compile(r'^coordinator_stage_seconds_(bucket|sum|count)\{(.*)\} (\S+)$')
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def scrape_stages(client_url: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """(stage, service) → {"sum", "count", "buckets": {le: cumulative count}} from /metrics."""
+    text = httpx.get(f"{client_url}/metrics", timeout=10).text
+    stages: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for line in text.splitlines():
+        m = SERIES.match(line)
+        if not m:
+            continue
+        kind, raw_labels, value = m.groups()
+        labels = dict(LABEL.findall(raw_labels))
+        entry = stages.setdefault((labels.get("stage", ""), labels.get("service", "")),
+                                  {"sum": 0.0, "count": 0, "buckets": {}})
+        if kind == "bucket":
+            entry["buckets"][float(labels["le"])] = float(value)
+        else:
+            entry[kind] = float(value)
+    return stages
+
+
+def bucket_quantile(buckets: Dict[float, float], q: float) -> Optional[float]:
+    """Quantile estimate by linear interpolation inside the cumulative buckets."""
+    bounds = sorted(buckets)
+    if not bounds or not buckets[bounds[-1]]:
+        return None
+    rank = q * buckets[bounds[-1]]
+    prev_bound, prev_count = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if bound == float("inf"):
+                return prev_bound
+            span = count - prev_count
+            return prev_bound + (bound - prev_bound) * ((rank - prev_count) / span if span else 1.0)
+        prev_bound, prev_count = bound, count
+    return prev_bound
+
+
+def stage_delta(before, after) -> List[Dict[str, Any]]:
+    rows = []
+    for key, end in sorted(after.items()):
+        start = before.get(key, {"sum": 0.0, "count": 0, "buckets": {}})
+        count = end["count"] - start["count"]
+        if count <= 0:
+            continue
+        buckets = {le: n - start["buckets"].get(le, 0.0) for le, n in end["buckets"].items()}
+        p95 = bucket_quantile(buckets, 0.95)
+        rows.append({
+            "stage": key[0],
+            "service": key[1],
+            "count": int(count),
+            "mean_ms": round((end["sum"] - start["sum"]) / count * 1000, 2),
+            "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+        })
+    return rows
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(scenario: str, latencies: List[float], outcomes: Dict[str, int], wall: float) -> Dict[str, Any]:
+    values = sorted(latencies)
+    ms = lambda v: round(v * 1000, 2)  # noqa: E731
+    return {
+        "scenario": scenario,
+        "requests": len(values),
+        "rejected": outcomes["rejected"],
+        "errors": outcomes["errors"],
+        "throughput_rps": round(len(values) / wall, 2) if wall else 0.0,
+        "p50_ms": ms(percentile(values, 0.50)),
+        "p95_ms": ms(percentile(values, 0.95)),
+        "p99_ms": ms(percentile(values, 0.99)),
+        "max_ms": ms(values[-1]) if values else 0.0,
+    }
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    print(f"\n{'scenario':<10} {'reqs':>6} {'4xx':>5} {'errors':>6} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for r in results:
+        print(f"{r['scenario']:<10} {r['requests']:>6} {r['rejected']:>5} {r['errors']:>6} {r['throughput_rps']:>9} "
+              f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['max_ms']:>9}")
+    if not any(r["stages"] for r in results):
+        print("\n(no per-stage breakdown: /metrics is per worker, run with --workers 1)")
+        return
+    for r in results:
+        print(f"\n{r['scenario']} stages{'':<25} {'count':>7} {'mean ms':>9} {'~p95 ms':>9}")
+        for s in r["stages"]:
+            name = s["stage"] + (f" [{s['service']}]" if s["service"] else "")
+            print(f"  {name:<35} {s['count']:>7} {s['mean_ms']:>9} {s['p95_ms'] if s['p95_ms'] is not None else '-':>9}")
+
+
+# ── main ─────────────────────────────────────────────────────────────────────────
+
+async def run(args: argparse.Namespace, stack: Stack) -> List[Dict[str, Any]]:
+    sentences = load_sentences(args.sentences)
+    if not sentences:
+        raise RuntimeError(f"no ```text sentences found in {args.sentences}")
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = []
+    async with httpx.AsyncClient(base_url=stack.coordinator_url, limits=limits, timeout=args.timeout) as client:
+        candidates = await candidates_for(client, sentences, args.k)
+        for scenario in args.scenarios:
+            if args.warmup:
+                await drive(client, scenario, sentences, candidates, args.warmup, args.concurrency, args.k)
+            # Metrics live per process: with several workers a scrape sees only one of them
+            per_stage = args.workers == 1
+            before = scrape_stages(stack.coordinator_url) if per_stage else {}
+            latencies, outcomes, wall = await drive(
+                client, scenario, sentences, candidates, args.requests, args.concurrency, args.k)
+            after = scrape_stages(stack.coordinator_url) if per_stage else {}
+            result = summarize(scenario, latencies, outcomes, wall)
+            result["stages"] = stage_delta(before, after)
+            results.append(result)
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the coordinator against fake LLM, Chroma and fixture services.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--k", type=int, default=5, help="search results (= dispatch candidates)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request (s)")
+    parser.add_argument("--sentences", default=os.path.join(ROOT, "exampleSentence.md"))
+    parser.add_argument("--llm-latency", type=float, default=0.25, help="fake chat completion latency (s)")
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="fake embeddings latency (s)")
+    parser.add_argument("--chroma-latency", type=float, default=0.005, help="fake Chroma latency (s)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the latency jitter")
+    parser.add_argument("--dispatch-mode", default="sequential", choices=("sequential", "speculative", "planner"))
+    parser.add_argument("--search-backend", default="chroma", choices=("chroma", "local"))
+    parser.add_argument("--cold", action="store_true", help="disable the embedding and rerank caches")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="coordinator worker processes (more than one shares the caches via SQLite)")
+    parser.add_argument("--port-base", type=int, default=18000)
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    parser.add_argument("--keep-logs", action="store_true", help="keep the process logs and trace files")
+    args = parser.parse_args(argv)
+
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="coordinator-bench-")
+    stack = Stack(args, workdir)
+    try:
+        stack.up()
+        results = asyncio.run(run(args, stack))
+    finally:
+        stack.down()
+        if args.keep_logs:
+            print(f"logs: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    if args.json_path:
+        config = {k: v for k, v in vars(args).items() if k not in ("json_path", "keep_logs")}
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "results": results}, f, indent=2)
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
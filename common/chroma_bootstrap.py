@@ -0,0 +1,170 @@
+"""
+Bulk, idempotent loader for the service registry in Chroma.
+
+Shared by chroma-agents/ and chroma-services/ (their `bootstrap_chroma.py`
+scripts call `main()`).
+"""
+import os
+import json
+import hashlib
+import argparse
+import requests
+import chromadb
+
+
+def flatten_metadata(metadata):
+    # Flatten metadata for ChromaDB (only str, int, float, bool allowed)
+    flat_metadata = {}
+    for key, value in metadata.items():
+        if isinstance(value, dict):
+            for subkey, subvalue in value.items():
+                flat_metadata[subkey] = subvalue
+        elif isinstance(value, list):
+            flat_metadata[key] = ",".join(map(str, value))
+        else:
+            flat_metadata[key] = value
+    return flat_metadata
+
+
+def content_hash(document, metadata, embed_model):
+    payload = json.dumps([document, metadata, embed_model], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def load_documents(source_dir):
+    """All JSON documents in `source_dir`, keyed by id (file name when the doc has none)."""
+    docs = {}
+    for file in sorted(os.listdir(source_dir)):
+        if not file.endswith(".json"):
+            continue
+        path = os.path.join(source_dir, file)
+        try:
+            with open(path, "r") as f:
+                doc = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Skipping {path}: {e}")
+            continue
+        doc_id = doc.get("id", os.path.splitext(file)[0])
+        docs[doc_id] = {
+            "document": doc.get("document", ""),
+            "metadata": flatten_metadata(doc.get("metadata", {})),
+        }
+    return docs
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def embed(texts, embed_url, embed_model, batch_size):
+    """Embed `texts` with the coordinator's embedding model, `batch_size` inputs per request."""
+    embeddings = []
+    for batch in chunks(texts, batch_size):
+        r = requests.post(embed_url, json={"model": embed_model, "input": batch}, timeout=120)
+        r.raise_for_status()
+        data = sorted(r.json()["data"], key=lambda d: d.get("index", 0))
+        embeddings.extend(d["embedding"] for d in data)
+    return embeddings
+
+
+def existing_hashes(collection, ids, chunk_size):
+    hashes = {}
+    for chunk in chunks(ids, chunk_size):
+        found = collection.get(ids=chunk, include=["metadatas"])
+        for doc_id, metadata in zip(found["ids"], found["metadatas"]):
+            hashes[doc_id] = (metadata or {}).get("content_hash")
+    return hashes
+
+
+def bootstrap_documents(
+    source_dir,
+    chroma_host,
+    chroma_port,
+    collection_name,
+    embed_url=None,
+    embed_model=None,
+    chunk_size=256,
+    embed_batch_size=64,
+):
+    """
+    Upsert every document in `source_dir` into `collection_name`.
+
+    Documents whose content hash (document, metadata and embedding model)
+    matches the one stored in Chroma are skipped, so re-running is cheap and
+    safe. Changed documents are embedded in batches via `embed_url` (Chroma's
+    default embedding function when unset) and upserted `chunk_size` at a time.
+
+    Returns the number of documents that could not be upserted (all of
+    them if Chroma is unreachable).
+    """
+    docs = load_documents(source_dir)
+
+    try:
+        client = chromadb.HttpClient(host=chroma_host, port=chroma_port)
+        collection = client.get_or_create_collection(name=collection_name)
+        print(f"✔️ Using collection: {collection.name}")
+    except Exception as e:
+        print(f"[ERROR] Failed to connect to ChromaDB: {e}")
+        return len(docs)
+
+    model_key = embed_model if embed_url else "chroma-default"
+    for doc in docs.values():
+        doc["metadata"]["content_hash"] = content_hash(doc["document"], doc["metadata"], model_key)
+
+    stored = existing_hashes(collection, list(docs), chunk_size)
+    changed = [doc_id for doc_id, doc in docs.items() if stored.get(doc_id) != doc["metadata"]["content_hash"]]
+    print(f"[INFO] {len(docs)} documents, {len(docs) - len(changed)} unchanged, {len(changed)} to upsert")
+
+    upserted = 0
+    for chunk in chunks(changed, chunk_size):
+        documents = [docs[doc_id]["document"] for doc_id in chunk]
+        metadatas = [docs[doc_id]["metadata"] for doc_id in chunk]
+        try:
+            if embed_url:
+                embeddings = embed(documents, embed_url, embed_model, embed_batch_size)
+                collection.upsert(ids=chunk, documents=documents, metadatas=metadatas, embeddings=embeddings)
+            else:
+                collection.upsert(ids=chunk, documents=documents, metadatas=metadatas)
+            upserted += len(chunk)
+            print(f"[OK] Upserted {len(chunk)} documents")
+        except Exception as e:
+            # Hashes of failed chunks are not stored, so the next run retries them
+            print(f"[WARN] Failed to upsert {len(chunk)} documents: {e}")
+
+    print(f"[DONE] {upserted}/{len(changed)} documents upserted")
+    return len(changed) - upserted
+
+
+def main(argv=None):
+    """CLI entry point; exits non-zero when any document failed (e.g. LM Studio is down)."""
+    lmstudio_url = os.getenv("LMSTUDIO_URL")
+    default_embed_url = (
+        lmstudio_url.rstrip("/") + os.getenv("lmstudio_embed_path", "/v1/embeddings") if lmstudio_url else None
+    )
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", required=True)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", default=8000, type=int)
+    parser.add_argument("--collection", required=True)
+    parser.add_argument("--embed-url", default=default_embed_url)
+    parser.add_argument("--embed-model", default=os.getenv("embed_model", "text-embedding-all-minilm-l12-v2"))
+    parser.add_argument("--chunk-size", default=int(os.getenv("BOOTSTRAP_CHUNK_SIZE", "256")), type=int)
+    parser.add_argument("--embed-batch-size", default=int(os.getenv("BOOTSTRAP_EMBED_BATCH_SIZE", "64")), type=int)
+
+    args = parser.parse_args(argv)
+    failed = bootstrap_documents(
+        args.source,
+        args.host,
+        args.port,
+        args.collection,
+        embed_url=args.embed_url,
+        embed_model=args.embed_model,
+        chunk_size=max(1, args.chunk_size),
+        embed_batch_size=max(1, args.embed_batch_size),
+    )
+    if failed:
+        print(f"[ERROR] {failed} documents were not upserted; the registry is incomplete")
+        return 1
+    return 0
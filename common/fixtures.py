@@ -0,0 +1,26 @@
+from typing import Any, Callable, Generic, TypeVar
+
+import json
+
+from common.watched_file import WatchedFile
+
+
+T = TypeVar("T")
+
+
+class Fixture(Generic[T]):
+    """
+    A JSON fixture file parsed once and indexed by `build`.
+
+    Reloaded through `WatchedFile` when the file changes, so a lookup on the
+    request path costs a timestamp comparison and a dict access.
+    """
+
+    def __init__(self, path: str, build: Callable[[Any], T], check_interval: float = 1.0):
+        self.path = path
+        self.build = build
+        self._file = WatchedFile(path, lambda text: build(json.loads(text)), check_interval, what="fixture")
+
+    @property
+    def data(self) -> T:
+        return self._file.value
@@ -0,0 +1,249 @@
+from contextlib import ExitStack, contextmanager
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import fcntl
+import glob
+import gzip
+import json
+import logging
+import os
+import shutil
+import time
+
+
+logger = logging.getLogger("trace_writer")
+
+
+class RotatingTraceLog:
+    """
+    Append-only trace log shared by several processes, split into segments.
+
+    All appends and rotations happen under an exclusive `flock` on
+    `<path>.lock`, so concurrent writers never interleave partial batches.
+    The lock file also holds the segment state: the logical byte offset at
+    which the current file starts and when it was opened. Closed segments are
+    named `<path>.<start offset>` (zero padded) and gzip-compressed by the
+    process that rotated them; retention drops the oldest ones.
+
+    Readers take a shared lock only long enough to open the files they need;
+    the reading itself happens afterwards on the open descriptors, so a long
+    download never holds up the writers.
+
+    Offsets are logical positions across all segments, so a reader tailing
+    with `read_since()` keeps its place across rotations.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 50 * 1024 * 1024,
+        max_age: float = 86400.0,
+        retention_segments: int = 14,
+        retention_age: float = 7 * 86400.0,
+        compress: bool = True,
+    ):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.retention_segments = retention_segments
+        self.retention_age = retention_age
+        self.compress = compress
+
+    # ── locking and segment state ───────────────────────────────────────────
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[object]:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.lock_path, "a+") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield lock
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_state(lock) -> dict:
+        lock.seek(0)
+        try:
+            return json.loads(lock.read() or "{}")
+        except ValueError:
+            return {}
+
+    @staticmethod
+    def _write_state(lock, state: dict) -> None:
+        lock.seek(0)
+        lock.truncate()
+        lock.write(json.dumps(state))
+        lock.flush()
+
+    def _segment_path(self, base: int) -> str:
+        return f"{self.path}.{base:016d}"
+
+    def segments(self) -> List[Tuple[int, str]]:
+        """Closed segments as (start offset, path), oldest first."""
+        found = {}
+        for seg in glob.glob(f"{glob.escape(self.path)}.[0-9]*"):
+            name = seg[len(self.path) + 1:]
+            digits, _, suffix = name.partition(".")
+            if not digits.isdigit() or suffix not in ("", "gz"):
+                continue
+            # Prefer the compressed copy if compaction was interrupted
+            if suffix == "gz" or int(digits) not in found:
+                found[int(digits)] = seg
+        return sorted(found.items())
+
+    # ── writing ─────────────────────────────────────────────────────────────
+
+    def append(self, data: bytes) -> bool:
+        """Append `data` (whole lines); returns True if a segment was closed first."""
+        rotated: Optional[str] = None
+        with self._locked(exclusive=True) as lock:
+            state = self._read_state(lock)
+            now = time.time()
+            if "started" not in state:
+                state = {"base": state.get("base", 0), "started": now}
+                self._write_state(lock, state)
+
+            try:
+                size = os.path.getsize(self.path)
+            except FileNotFoundError:
+                size = 0
+            if size and (size + len(data) > self.max_bytes or now - state["started"] >= self.max_age):
+                rotated = self._segment_path(state["base"])
+                os.rename(self.path, rotated)
+                self._write_state(lock, {"base": state["base"] + size, "started": now})
+                self._apply_retention(now)
+
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+
+        if rotated and self.compress:
+            self._compress(rotated)
+        return rotated is not None
+
+    def _compress(self, segment: str) -> None:
+        tmp = f"{segment}.gz.tmp"
+        try:
+            with open(segment, "rb") as src, gzip.open(tmp, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            # Swap under the lock so readers never list a file that is about to vanish
+            with self._locked(exclusive=True):
+                if not os.path.exists(segment):
+                    # Dropped by retention while it was being compressed
+                    os.remove(tmp)
+                    return
+                os.rename(tmp, f"{segment}.gz")
+                os.remove(segment)
+        except OSError as e:
+            logger.warning("Failed to compress trace segment %s: %s", segment, e)
+
+    def _apply_retention(self, now: float) -> None:
+        segments = self.segments()
+        expired = segments[:max(0, len(segments) - self.retention_segments)]
+        for base, seg in segments[len(expired):]:
+            try:
+                if now - os.path.getmtime(seg) > self.retention_age:
+                    expired.append((base, seg))
+            except FileNotFoundError:
+                continue
+        for _, seg in expired:
+            for candidate in (seg, f"{seg}.gz") if not seg.endswith(".gz") else (seg,):
+                try:
+                    os.remove(candidate)
+                except FileNotFoundError:
+                    pass
+
+    # ── reading ─────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _open_segment(path: str) -> BinaryIO:
+        return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+    def _open_range(self, offset: Optional[int], stack: ExitStack) -> Tuple[List[Tuple[BinaryIO, int, int]], int, bool]:
+        """
+        Open everything from logical `offset` on (everything if None, which
+        raises FileNotFoundError when there is no log yet).
+
+        Returns ([(file, skip, limit)], start offset, reset). The current file
+        is limited to its size at the time of the call (-1: read to the end).
+        """
+        with self._locked(exclusive=False) as lock:
+            base = self._read_state(lock).get("base", 0)
+            segments = self.segments()
+            try:
+                current = stack.enter_context(open(self.path, "rb"))
+                end = base + os.fstat(current.fileno()).st_size
+            except FileNotFoundError:
+                current, end = None, base
+            if offset is None and current is None and not segments:
+                raise FileNotFoundError(self.path)
+            oldest = segments[0][0] if segments else base
+
+            reset = offset is not None and (offset < oldest or offset > end)
+            start = oldest if offset is None or reset else offset
+
+            sources = []
+            bounds = [seg_base for seg_base, _ in segments[1:]] + [base]
+            for (seg_base, seg), seg_end in zip(segments, bounds):
+                if seg_end > start:
+                    f = stack.enter_context(self._open_segment(seg))
+                    sources.append((f, max(0, start - seg_base), -1))
+            if end > start:
+                skip = max(0, start - base)
+                sources.append((current, skip, end - base - skip))
+        return sources, start, reset
+
+    @staticmethod
+    def _read(f: BinaryIO, skip: int, limit: int) -> bytes:
+        if skip:
+            f.seek(skip)
+        return f.read(limit)
+
+    def read_all(self, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """
+        Every retained segment plus the current file, oldest first.
+
+        The files are opened right away (raising FileNotFoundError if there is
+        no log at all) and then read in `chunk_size` pieces as the iterator is
+        consumed, so the whole log is never held in memory.
+        """
+        stack = ExitStack()
+        try:
+            sources, _, _ = self._open_range(None, stack)
+        except BaseException:
+            stack.close()
+            raise
+        return self._stream(sources, stack, chunk_size)
+
+    @staticmethod
+    def _stream(sources: List[Tuple[BinaryIO, int, int]], stack: ExitStack, chunk_size: int) -> Iterator[bytes]:
+        with stack:
+            for f, skip, limit in sources:
+                if skip:
+                    f.seek(skip)
+                while limit != 0:
+                    chunk = f.read(chunk_size if limit < 0 else min(chunk_size, limit))
+                    if not chunk:
+                        break
+                    if limit > 0:
+                        limit -= len(chunk)
+                    yield chunk
+
+    def read_since(self, offset: int) -> Tuple[str, int, bool]:
+        """
+        Complete lines after logical `offset`.
+
+        Returns (text, next offset, reset); `reset` is True when `offset` is
+        no longer retained (or lies in the future) and reading restarted at
+        the oldest available line.
+        """
+        with ExitStack() as stack:
+            sources, start, reset = self._open_range(offset, stack)
+            data = b"".join(self._read(f, skip, limit) for f, skip, limit in sources)
+        # Only hand out whole lines; a partially written line is sent next time
+        cut = data.rfind(b"\n") + 1
+        return data[:cut].decode("utf-8", errors="replace"), start + cut, reset
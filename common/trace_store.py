@@ -0,0 +1,135 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import json
+import os
+import sqlite3
+import threading
+
+
+# (correlation_id, timestamp, service, event JSON)
+TraceRow = Tuple[Optional[str], Optional[str], Optional[str], str]
+
+
+class TraceStore:
+    """
+    SQLite-backed trace index shared by all services writing to /shared/logs.
+
+    Rows are appended and only removed by `prune()`; the autoincrement id
+    doubles as the paging cursor.
+    Indexes on (correlation_id, id) and timestamp keep per-request lookups
+    and "latest N" queries independent of the total trace volume.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS traces ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " correlation_id TEXT, timestamp TEXT, service TEXT, event TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS traces_correlation ON traces (correlation_id, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS traces_timestamp ON traces (timestamp)")
+        # Latest row per correlation id, maintained on insert so listing requests stays cheap
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS correlations ("
+            " correlation_id TEXT PRIMARY KEY, last_id INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS correlations_last_id ON correlations (last_id)")
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS traces_track_correlation AFTER INSERT ON traces"
+            " WHEN NEW.correlation_id IS NOT NULL BEGIN"
+            " INSERT INTO correlations (correlation_id, last_id) VALUES (NEW.correlation_id, NEW.id)"
+            " ON CONFLICT (correlation_id) DO UPDATE SET last_id = excluded.last_id;"
+            " END"
+        )
+
+    def insert(self, rows: Iterable[TraceRow]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO traces (correlation_id, timestamp, service, event) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def prune(self, before_timestamp: str) -> int:
+        """Delete events older than `before_timestamp` (ISO format); returns the count."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                deleted = self._conn.execute(
+                    "DELETE FROM traces WHERE timestamp < ?", (before_timestamp,)
+                ).rowcount
+                self._conn.execute(
+                    "DELETE FROM correlations WHERE NOT EXISTS"
+                    " (SELECT 1 FROM traces WHERE traces.correlation_id = correlations.correlation_id)"
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return deleted
+
+    def _select(self, sql: str, params: Tuple) -> List[Tuple[int, str]]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _events(rows: List[Tuple[int, str]]) -> List[Dict[str, Any]]:
+        return [{**json.loads(event), "_cursor": rid} for rid, event in rows]
+
+    def by_correlation(self, correlation_id: str, cursor: int = 0, limit: int = 100) -> Dict[str, Any]:
+        """Events of one request after `cursor`, oldest first."""
+        rows = self._select(
+            "SELECT id, event FROM traces WHERE correlation_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (correlation_id, cursor, limit),
+        )
+        return {
+            "events": self._events(rows),
+            "next_cursor": rows[-1][0] if len(rows) == limit else None,
+        }
+
+    def after(self, cursor: int, correlation_id: Optional[str] = None, limit: int = 500) -> List[Dict[str, Any]]:
+        """Events appended after `cursor`, optionally for one request only."""
+        if correlation_id is None:
+            rows = self._select("SELECT id, event FROM traces WHERE id > ? ORDER BY id LIMIT ?", (cursor, limit))
+        else:
+            rows = self._select(
+                "SELECT id, event FROM traces WHERE correlation_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (correlation_id, cursor, limit),
+            )
+        return self._events(rows)
+
+    def last_cursor(self) -> int:
+        row = self._select("SELECT MAX(id) FROM traces", ())[0]
+        return row[0] or 0
+
+    def recent(self, limit: int = 100, before: Optional[int] = None) -> Dict[str, Any]:
+        """Latest events (optionally older than `before`), oldest first."""
+        if before is None:
+            rows = self._select("SELECT id, event FROM traces ORDER BY id DESC LIMIT ?", (limit,))
+        else:
+            rows = self._select("SELECT id, event FROM traces WHERE id < ? ORDER BY id DESC LIMIT ?", (before, limit))
+        rows.reverse()
+        return {
+            "events": self._events(rows),
+            "next_cursor": rows[0][0] if len(rows) == limit else None,
+        }
+
+    def correlation_ids(self, limit: int = 5) -> List[str]:
+        """Most recently active correlation ids, newest first."""
+        rows = self._select("SELECT correlation_id FROM correlations ORDER BY last_id DESC LIMIT ?", (limit,))
+        return [r[0] for r in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
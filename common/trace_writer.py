@@ -0,0 +1,211 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from common.trace_log import RotatingTraceLog
+from common.trace_store import TraceRow, TraceStore
+
+# ── config ───────────────────────────────────────────────────────────────────────
+TRACE_LOG_PATH           = os.getenv("TRACE_LOG_PATH", "/shared/logs/trace.log")
+# indexed SQLite copy of the trace events; empty disables it
+TRACE_DB_PATH            = os.getenv("TRACE_DB_PATH", "/shared/logs/trace.db")
+TRACE_QUEUE_SIZE         = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))
+TRACE_BATCH_SIZE         = int(os.getenv("TRACE_BATCH_SIZE", "256"))
+TRACE_FLUSH_INTERVAL     = float(os.getenv("TRACE_FLUSH_INTERVAL", "0.5"))
+# "drop": discard events when the queue is full, "block": wait up to TRACE_BLOCK_TIMEOUT
+TRACE_OVERFLOW           = os.getenv("TRACE_OVERFLOW", "drop")
+TRACE_BLOCK_TIMEOUT      = float(os.getenv("TRACE_BLOCK_TIMEOUT", "1.0"))
+TRACE_STDOUT             = os.getenv("TRACE_STDOUT", "0") == "1"
+# rotation: close the current segment past this size or age, gzip it, keep the newest few
+TRACE_MAX_BYTES          = int(os.getenv("TRACE_MAX_BYTES", str(50 * 1024 * 1024)))
+TRACE_ROTATE_INTERVAL    = float(os.getenv("TRACE_ROTATE_INTERVAL", "86400"))
+TRACE_RETENTION_SEGMENTS = int(os.getenv("TRACE_RETENTION_SEGMENTS", "14"))
+# also bounds the SQLite store: older rows are deleted on rotation
+TRACE_RETENTION_DAYS     = float(os.getenv("TRACE_RETENTION_DAYS", "7"))
+TRACE_COMPRESS           = os.getenv("TRACE_COMPRESS", "1") == "1"
+# ────────────────────────────────────────────────────────────────────────────────
+
+logger = logging.getLogger("trace_writer")
+
+_STOP = object()
+
+
+def open_trace_log(path: str = TRACE_LOG_PATH) -> RotatingTraceLog:
+    """Segmented trace log configured from the TRACE_* environment variables."""
+    return RotatingTraceLog(
+        path,
+        max_bytes=TRACE_MAX_BYTES,
+        max_age=TRACE_ROTATE_INTERVAL,
+        retention_segments=TRACE_RETENTION_SEGMENTS,
+        retention_age=TRACE_RETENTION_DAYS * 86400,
+        compress=TRACE_COMPRESS,
+    )
+
+
+class TraceWriter:
+    """
+    Non-blocking JSON-lines trace writer.
+
+    `write()` serializes the event once and puts the line on a bounded queue.
+    A background thread drains the queue and appends lines in batches, flushing
+    when `batch_size` lines are buffered or `flush_interval` seconds have passed.
+    Batches go to a `RotatingTraceLog`, so the file is rotated, compressed and
+    pruned as it grows, and are also inserted into the indexed `TraceStore` at
+    `db_path`; store rows older than the retention window are deleted whenever
+    a segment is rotated.
+    When the queue is full the event is dropped ("drop") or the caller waits
+    up to `block_timeout` seconds ("block"). `close()` flushes everything that
+    was queued.
+    """
+
+    def __init__(
+        self,
+        path: str = TRACE_LOG_PATH,
+        db_path: str = TRACE_DB_PATH,
+        max_queue: int = TRACE_QUEUE_SIZE,
+        batch_size: int = TRACE_BATCH_SIZE,
+        flush_interval: float = TRACE_FLUSH_INTERVAL,
+        overflow: str = TRACE_OVERFLOW,
+        block_timeout: float = TRACE_BLOCK_TIMEOUT,
+        echo: bool = TRACE_STDOUT,
+    ):
+        self.path = path
+        self.log = open_trace_log(path)
+        self.db_path = db_path
+        self._store: Optional[TraceStore] = None
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.echo = echo
+        self.written = 0
+        self.dropped = 0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+    def _ensure_started(self) -> None:
+        # Started lazily (and again after a fork) so every process gets its own thread
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+            self._thread.start()
+
+    def write(self, event: Dict[str, Any]) -> bool:
+        """Queue one event; returns False if it was dropped."""
+        if self._closed:
+            return False
+        self._ensure_started()
+        line = json.dumps(event, default=str)
+        item = (line, (event.get("correlation_id"), event.get("timestamp"), event.get("service"), line))
+        try:
+            if self.overflow == "block":
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self) -> None:
+        if self.db_path:
+            try:
+                self._store = TraceStore(self.db_path)
+            except Exception as e:
+                logger.warning("Trace store %s unavailable: %s", self.db_path, e)
+        batch: List[Tuple[str, TraceRow]] = []
+        deadline = time.monotonic() + self.flush_interval
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+            except queue.Empty:
+                pass
+
+            if batch and (stopping or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+        if self._store is not None:
+            self._store.close()
+
+    def _flush(self, batch: List[Tuple[str, TraceRow]]) -> None:
+        data = "".join(line + "\n" for line, _ in batch)
+        rotated = False
+        try:
+            rotated = self.log.append(data.encode("utf-8"))
+            self.written += len(batch)
+        except OSError as e:
+            self.dropped += len(batch)
+            logger.warning("Failed to write %d trace events to %s: %s", len(batch), self.path, e)
+        if self._store is not None:
+            try:
+                self._store.insert(row for _, row in batch)
+            except Exception as e:
+                logger.warning("Failed to index %d trace events in %s: %s", len(batch), self.db_path, e)
+            if rotated:
+                self._prune_store()
+        if self.echo:
+            sys.stdout.write(data)
+            sys.stdout.flush()
+
+    def _prune_store(self) -> None:
+        cutoff = (datetime.utcnow() - timedelta(seconds=self.log.retention_age)).isoformat()
+        try:
+            pruned = self._store.prune(cutoff)
+            if pruned:
+                logger.info("Pruned %d trace rows older than %s", pruned, cutoff)
+        except Exception as e:
+            logger.warning("Failed to prune trace store %s: %s", self.db_path, e)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush queued events and stop the background thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return {"queued": self._queue.qsize(), "written": self.written, "dropped": self.dropped}
+
+
+_writer: Optional[TraceWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_trace_writer() -> TraceWriter:
+    """Process-wide writer configured from the TRACE_* environment variables."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = TraceWriter()
+                atexit.register(_writer.close)
+    return _writer
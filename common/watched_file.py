@@ -0,0 +1,54 @@
+from typing import Callable, Generic, Optional, TypeVar
+
+import os
+import threading
+import time
+
+
+T = TypeVar("T")
+
+
+class WatchedFile(Generic[T]):
+    """
+    A text file turned into a value by `load` and reloaded when it changes.
+
+    The file is re-read only when its mtime changes; the mtime is checked at
+    most every `check_interval` seconds, so `value` on a hot request path
+    costs a timestamp comparison. A file that fails to load while it is
+    being replaced leaves the last good value in place; only a failed first
+    load raises.
+    """
+
+    def __init__(self, path: str, load: Callable[[str], T], check_interval: float = 1.0, what: str = "file"):
+        self.path = path
+        self.load = load
+        self.check_interval = check_interval
+        self.what = what
+        self._value: Optional[T] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if self._mtime is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+                if mtime == self._mtime:
+                    return
+                with open(self.path, "r", encoding="utf-8") as f:
+                    value = self.load(f.read())
+            except Exception as e:
+                if self._mtime is not None:
+                    return
+                raise RuntimeError(f"Failed to load {self.what} from {self.path}: {e}")
+            self._value = value
+            self._mtime = mtime
+
+    @property
+    def value(self) -> T:
+        self._refresh()
+        return self._value
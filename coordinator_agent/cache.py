@@ -0,0 +1,339 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+# ── config ───────────────────────────────────────────────────────────────────────
+# How long a read or write of a "sqlite" or "shared" cache waits for another
+# writer's lock before it counts as a miss / skipped write (seconds). Cache
+# calls run on the event loop, so a wait stalls every request of that worker:
+# keep it short.
+SQLITE_CACHE_BUSY_TIMEOUT = float(os.getenv("SQLITE_CACHE_BUSY_TIMEOUT", "0.05"))
+# ────────────────────────────────────────────────────────────────────────────────
+
+_MISSING = object()
+
+logger = logging.getLogger("coordinator")
+
+
+class LRUCache:
+    """
+    Bounded in-memory LRU cache with optional per-entry TTL and hit/miss counters.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, stored_at = entry
+                if self.ttl is None or self.clock() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, self.clock())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        with self._lock:
+            snapshot = [(k, v) for k, (v, _) in self._data.items()]
+        return iter(snapshot)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class SQLiteCache:
+    """
+    LRU/TTL cache persisted in a local SQLite file.
+
+    Same interface as `LRUCache`; values must be JSON serializable and keys
+    other than strings are stored JSON-encoded. Uses wall-clock time so
+    entries survive restarts. Several processes can share one file.
+
+    The cache is best effort: if the file is still locked after
+    `busy_timeout`, a lookup counts as a miss and a write is skipped. Both
+    are counted in `stats()["errors"]` instead of failing the caller.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+        busy_timeout: float = 5.0,
+    ):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        # Setup above may wait for other processes; lookups only wait this long
+        self._conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        return key if isinstance(key, str) else json.dumps(key)
+
+    def _unavailable(self, e: sqlite3.Error) -> None:
+        self.errors += 1
+        logger.debug("SQLite cache %s unavailable: %s", self.path, e)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        key = self._key(key)
+        now = self.clock()
+        with self._lock:
+            try:
+                row = self._conn.execute("SELECT value, stored_at FROM cache WHERE key = ?", (key,)).fetchone()
+            except sqlite3.OperationalError as e:
+                self._unavailable(e)
+                row = None
+            if row is not None:
+                value, stored_at = row
+                if self.ttl is None or now - stored_at < self.ttl:
+                    try:
+                        self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+                    except sqlite3.OperationalError:
+                        # Database locked by another writer: keep the hit, skip the LRU touch
+                        pass
+                    self.hits += 1
+                    return json.loads(value)
+                try:
+                    self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                except sqlite3.OperationalError:
+                    # Expired either way; the next write's eviction or lookup drops it
+                    pass
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        key = self._key(key)
+        now = self.clock()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now),
+                )
+                overflow = len(self) - self.maxsize
+                if overflow > 0:
+                    self._conn.execute(
+                        "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                        (overflow,),
+                    )
+            except sqlite3.OperationalError as e:
+                self._unavailable(e)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM cache ORDER BY accessed_at").fetchall()
+        return iter([(k, json.loads(v)) for k, v in rows])
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "errors": self.errors,
+        }
+
+
+class TieredCache:
+    """
+    Per-process `LRUCache` in front of a cache shared by all workers.
+
+    Lookups try the local tier first and copy shared hits into it; writes go
+    to both. Errors of the shared tier (e.g. a database still locked after
+    `SQLITE_CACHE_BUSY_TIMEOUT`) count as misses and skipped writes, so a
+    busy store stalls the event loop for at most that long; they are counted
+    in `stats()["shared_errors"]`.
+    """
+
+    def __init__(self, local: LRUCache, shared: SQLiteCache):
+        self.local = local
+        self.shared = shared
+        self.shared_hits = 0
+        self.shared_errors = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        try:
+            value = self.shared.get(key, _MISSING)
+        except sqlite3.Error as e:
+            self.shared_errors += 1
+            logger.debug("Shared cache %s unavailable: %s", self.shared.path, e)
+            return default
+        if value is _MISSING:
+            return default
+        self.shared_hits += 1
+        self.local.set(key, value)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.local.set(key, value)
+        try:
+            self.shared.set(key, value)
+        except sqlite3.Error as e:
+            self.shared_errors += 1
+            logger.debug("Shared cache %s unavailable: %s", self.shared.path, e)
+
+    def clear(self) -> None:
+        self.local.clear()
+        self.shared.clear()
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        return self.local.items()
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.local.hits + self.shared_hits
+        lookups = self.local.hits + self.local.misses
+        return {
+            "backend": "shared",
+            "size": len(self.local),
+            "maxsize": self.local.maxsize,
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "shared_hits": self.shared_hits,
+            "shared_errors": self.shared_errors + self.shared.errors,
+            "shared": self.shared.stats(),
+        }
+
+
+def make_cache(backend: str, maxsize: int = 1024, ttl: Optional[float] = None, path: str = ""):
+    """
+    Build a cache for `backend`: "memory" (default), "sqlite", "shared"
+    (per-process LRU in front of the SQLite file at `path`, for several
+    workers) or "off".
+    """
+    if backend == "off":
+        return LRUCache(maxsize=0)
+    if backend in ("sqlite", "shared"):
+        if not path:
+            raise RuntimeError(f"{backend} cache backend requires a path")
+        store = SQLiteCache(path, maxsize=maxsize, ttl=ttl, busy_timeout=SQLITE_CACHE_BUSY_TIMEOUT)
+        if backend == "sqlite":
+            return store
+        return TieredCache(LRUCache(maxsize=maxsize, ttl=ttl), store)
+    return LRUCache(maxsize=maxsize, ttl=ttl)
+
+
+def load_embedding_cache(cache: LRUCache, path: str) -> int:
+    """Fill `cache` from a JSON-lines file written by `save_embedding_cache()`."""
+    if not path or not os.path.exists(path):
+        return 0
+    loaded = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                cache.set((entry["model"], entry["text"]), entry["embedding"])
+                loaded += 1
+            except (ValueError, KeyError):
+                continue
+    return loaded
+
+
+def save_embedding_cache(cache: LRUCache, path: str) -> int:
+    """
+    Write all cached embeddings to `path` (atomically, oldest first).
+
+    Each call writes its own temporary file, so workers shutting down
+    together don't clobber each other; the last one to finish wins.
+    """
+    if not path:
+        return 0
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    saved = 0
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=directory, prefix=f"{os.path.basename(path)}.", suffix=".tmp", delete=False
+    ) as f:
+        tmp_path = f.name
+        try:
+            for (model, text), embedding in cache.items():
+                f.write(json.dumps({"model": model, "text": text, "embedding": embedding}) + "\n")
+                saved += 1
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, path)
+    return saved
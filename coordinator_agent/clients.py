@@ -0,0 +1,91 @@
+from typing import Dict, Optional
+
+import asyncio
+import os
+
+import httpx
+
+
+# ── config ───────────────────────────────────────────────────────────────────────
+connect_timeout   = float(os.getenv("HTTP_CONNECT_TIMEOUT", "2"))
+read_timeout      = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+keepalive_expiry  = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+lmstudio_max_connections         = int(os.getenv("LMSTUDIO_MAX_CONNECTIONS", "16"))
+chroma_max_connections           = int(os.getenv("CHROMA_MAX_CONNECTIONS", "32"))
+service_max_connections          = int(os.getenv("SERVICE_MAX_CONNECTIONS", "128"))
+service_max_connections_per_host = int(os.getenv("SERVICE_MAX_CONNECTIONS_PER_HOST", "16"))
+# ────────────────────────────────────────────────────────────────────────────────
+
+request_timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+_service_pool: Optional["ServicePool"] = None
+
+
+def _client(name: str, max_connections: int) -> httpx.AsyncClient:
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=request_timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+        _clients[name] = client
+    return client
+
+
+class ServicePool:
+    """
+    Shared keep-alive pool for the downstream service endpoints.
+
+    All services share one connection pool; a semaphore per host keeps a
+    single slow service from taking every connection.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, max_per_host: int):
+        self.client = client
+        self.max_per_host = max_per_host
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+
+    def slot(self, url: str) -> asyncio.Semaphore:
+        """The per-host semaphore guarding requests to `url`."""
+        host = httpx.URL(url).netloc.decode()
+        sem = self._hosts.get(host)
+        if sem is None:
+            sem = self._hosts[host] = asyncio.Semaphore(self.max_per_host)
+        return sem
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        async with self.slot(url):
+            return await self.client.post(url, **kwargs)
+
+
+def lmstudio_client() -> httpx.AsyncClient:
+    """Pool for the LM Studio embedding and chat endpoints."""
+    return _client("lmstudio", lmstudio_max_connections)
+
+
+def chroma_client() -> httpx.AsyncClient:
+    """Pool for the Chroma REST API."""
+    return _client("chroma", chroma_max_connections)
+
+
+def service_pool() -> ServicePool:
+    """Pool for the downstream services picked during dispatch."""
+    global _service_pool
+    client = _client("services", service_max_connections)
+    if _service_pool is None or _service_pool.client is not client:
+        _service_pool = ServicePool(client, service_max_connections_per_host)
+    return _service_pool
+
+
+async def close_clients() -> None:
+    global _service_pool
+    for client in list(_clients.values()):
+        await client.aclose()
+    _clients.clear()
+    _service_pool = None
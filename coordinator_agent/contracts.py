@@ -0,0 +1,168 @@
+from typing import Any, Dict, Iterable, List, Tuple
+
+import copy
+import hashlib
+import json
+import os
+
+from coordinator_agent.cache import LRUCache
+from coordinator_agent.validation import get_validator
+
+
+# ── config ───────────────────────────────────────────────────────────────────────
+CONTRACT_CACHE_SIZE = int(os.getenv("CONTRACT_CACHE_SIZE", "1024"))
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+def allow_nulls(schema):
+    """Recursively update the schema to allow null values for all properties."""
+    if not isinstance(schema, dict):
+        return schema
+
+    if schema.get("type") == "object" and "properties" in schema:
+        for key, prop in schema["properties"].items():
+            if "type" in prop:
+                current_type = prop["type"]
+                if isinstance(current_type, str):
+                    prop["type"] = [current_type, "null"]
+                elif isinstance(current_type, list) and "null" not in current_type:
+                    prop["type"].append("null")
+            schema["properties"][key] = allow_nulls(prop)
+
+    if schema.get("type") == "array" and "items" in schema:
+        schema["items"] = allow_nulls(schema["items"])
+
+    return schema
+
+
+def required_inputs(contract_input: dict) -> List[str]:
+    """Required input fields of a contract; falls back to all non-nullable properties."""
+    props = contract_input.get("properties", {})
+    raw_required = contract_input.get("required")
+    return raw_required or [
+        k for k, v in props.items()
+        if not (isinstance(v.get("type"), list) and "null" in v["type"])
+    ]
+
+
+def has_value(context: dict, key: str) -> bool:
+    return key in context and context[key] is not None and str(context[key]).lower() != "null"
+
+
+class Contract:
+    """
+    One service's input/output contract, parsed and prepared once.
+
+    `nullable_properties` are the input properties widened to accept null
+    (the shape the extractor fills); `required` and `output_fields` drive
+    dependency resolution. Validators are compiled on first use. Instances
+    are shared between requests and must be treated as read-only.
+    """
+
+    __slots__ = (
+        "service_id", "version", "key", "input", "output",
+        "nullable_properties", "required", "input_fields", "output_fields",
+        "_input_validator", "_output_validator",
+    )
+
+    def __init__(self, service_id: str, version: str, key: Tuple[str, str, str], contract_input: dict, contract_output: dict):
+        self.service_id = service_id
+        self.version = version
+        self.key = key
+        self.input = contract_input
+        self.output = contract_output
+        self.nullable_properties: Dict[str, Any] = allow_nulls(
+            {"type": "object", "properties": copy.deepcopy(contract_input.get("properties", {}))}
+        )["properties"]
+        self.required: Tuple[str, ...] = tuple(required_inputs(contract_input))
+        self.input_fields: Tuple[str, ...] = tuple(contract_input.get("properties", {}))
+        self.output_fields: Tuple[str, ...] = tuple(contract_output.get("properties", {}))
+        self._input_validator = None
+        self._output_validator = None
+
+    @property
+    def input_validator(self):
+        if self._input_validator is None:
+            self._input_validator = get_validator(self.input)
+        return self._input_validator
+
+    @property
+    def output_validator(self):
+        if self._output_validator is None:
+            self._output_validator = get_validator(self.output)
+        return self._output_validator
+
+    def resolve(self, context: dict) -> Tuple[Dict[str, Any], List[str]]:
+        """Split the required inputs into resolved values and missing field names."""
+        resolved = {k: context[k] for k in self.required if has_value(context, k)}
+        missing = [k for k in self.required if k not in resolved]
+        return resolved, missing
+
+
+class ContractRegistry:
+    """
+    Parsed contracts keyed by (service id, version, contract digest).
+
+    Services carry their contracts as JSON strings in Chroma metadata; the
+    digest of those strings is part of the key, so a changed contract is
+    picked up even if its `version` was not bumped. Merged extraction
+    schemas are cached per set of contracts.
+    """
+
+    def __init__(self, maxsize: int = CONTRACT_CACHE_SIZE):
+        self._contracts = LRUCache(maxsize=maxsize)
+        self._merged = LRUCache(maxsize=maxsize)
+
+    @staticmethod
+    def _key(service: Dict[str, Any]) -> Tuple[str, str, str]:
+        metadata = service.get("metadata", {})
+        raw = f"{metadata.get('contract_input', '')}\0{metadata.get('contract_output', '')}"
+        digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+        return service["id"], str(metadata.get("version", "")), digest
+
+    def get(self, service: Dict[str, Any]) -> Contract:
+        """Contract of a search result / candidate (`id` + `metadata`)."""
+        key = self._key(service)
+        contract = self._contracts.get(key)
+        if contract is None:
+            metadata = service.get("metadata", {})
+            contract = Contract(
+                service["id"],
+                key[1],
+                key,
+                json.loads(metadata.get("contract_input") or "{}"),
+                json.loads(metadata.get("contract_output") or "{}"),
+            )
+            self._contracts.set(key, contract)
+        return contract
+
+    def for_candidates(self, candidates: Iterable[Dict[str, Any]]) -> Dict[str, Contract]:
+        return {c["id"]: self.get(c) for c in candidates}
+
+    def merged_input_schema(self, contracts: Iterable[Contract]) -> dict:
+        """
+        Nullable object schema over the input properties of all given
+        contracts (later contracts win on conflicting names). Shared; do not
+        mutate the result.
+        """
+        contracts = list(contracts)
+        key = tuple(c.key for c in contracts)
+        schema = self._merged.get(key)
+        if schema is None:
+            merged_props: Dict[str, Any] = {}
+            for contract in contracts:
+                merged_props.update(contract.nullable_properties)
+            schema = {"type": "object", "properties": merged_props}
+            self._merged.set(key, schema)
+        return schema
+
+    def stats(self) -> Dict[str, Any]:
+        return {"contracts": self._contracts.stats(), "merged_schemas": self._merged.stats()}
+
+
+registry = ContractRegistry()
+
+
+def merged_input_schema(contracts: Iterable[Contract]) -> dict:
+    return registry.merged_input_schema(contracts)
+
@@ -0,0 +1,157 @@
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import asyncio
+import heapq
+import logging
+
+from coordinator_agent.contracts import Contract, has_value
+from coordinator_agent.metrics import timed
+
+
+logger = logging.getLogger("coordinator")
+
+
+def dependency_order(
+    pids: List[str],
+    contract_map: Dict[str, Contract],
+    known_fields: Iterable[str],
+) -> Tuple[List[str], Dict[str, List[str]]]:
+    """
+    Kahn's algorithm over the declared contracts.
+
+    Builds a field → consumers index once, then releases a service when the
+    last of its required fields is known or produced by an earlier service;
+    linear in services plus fields. Returns the services in a valid
+    execution order and, for every service that can never run, the required
+    fields no service provides.
+    """
+    known = set(known_fields)
+    missing: Dict[str, Set[str]] = {}
+    consumers: Dict[str, List[str]] = defaultdict(list)
+    ready = deque()
+    for pid in pids:
+        missing[pid] = set(contract_map[pid].required) - known
+        for field in missing[pid]:
+            consumers[field].append(pid)
+        if not missing[pid]:
+            ready.append(pid)
+
+    order: List[str] = []
+    while ready:
+        pid = ready.popleft()
+        order.append(pid)
+        for field in contract_map[pid].output_fields:
+            if field in known:
+                continue
+            known.add(field)
+            for consumer in consumers.pop(field, ()):
+                missing[consumer].discard(field)
+                if not missing[consumer]:
+                    ready.append(consumer)
+
+    placed = set(order)
+    unresolvable = {
+        pid: [k for k in contract_map[pid].required if k in missing[pid]]
+        for pid in pids if pid not in placed
+    }
+    return order, unresolvable
+
+
+async def execute_dag(
+    order: List[str],
+    contract_map: Dict[str, Contract],
+    context: Dict[str, Any],
+    call_service: Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]],
+    max_concurrency: int = 4,
+    on_result: Optional[Callable[[str, Any], None]] = None,
+) -> Tuple[Dict[str, Any], Dict[str, List[str]]]:
+    """
+    Run the services in `order` along their data-dependency DAG.
+
+    Services whose required inputs no declared contract output can ever
+    provide are rejected up front (see `dependency_order()`). The rest wait
+    on a field → consumers index with their set of missing fields; each
+    response that fills a field releases it for its consumers, and a
+    service enters the ready queue (dependency order first, then `order`)
+    once nothing is missing. Independent services run side by side, bounded
+    by `max_concurrency`. Every successful response is merged into `context`,
+    and every response is passed to `on_result` as soon as it lands.
+
+    Returns the responses keyed by service id and, for every service that
+    could never be started, the list of inputs it was still missing.
+    """
+    pids = [pid for pid in order if pid in contract_map]
+    responses: Dict[str, Any] = {}
+    running: Dict[asyncio.Task, str] = {}
+    max_concurrency = max(1, max_concurrency)
+
+    with timed("topo_sort"):
+        static_order, unresolved = dependency_order(pids, contract_map, (k for k in context if has_value(context, k)))
+    # Dependency order first, `order` among services that are independent of each other
+    priority = {pid: i for i, pid in enumerate(static_order)}
+
+    missing: Dict[str, Set[str]] = {}
+    consumers: Dict[str, List[str]] = defaultdict(list)
+    ready: List[Tuple[int, str]] = []
+
+    def wait_for(pid: str) -> None:
+        fields = {k for k in contract_map[pid].required if not has_value(context, k)}
+        missing[pid] = fields
+        for field in fields:
+            consumers[field].append(pid)
+        if not fields:
+            heapq.heappush(ready, (priority[pid], pid))
+
+    for pid in pids:
+        if pid not in unresolved:
+            wait_for(pid)
+
+    try:
+        while True:
+            while ready and len(running) < max_concurrency:
+                _, pid = heapq.heappop(ready)
+                resolved, still_missing = contract_map[pid].resolve(context)
+                if still_missing:
+                    # A later response overwrote an input with null; wait for it again
+                    wait_for(pid)
+                    continue
+                del missing[pid]
+                running[asyncio.create_task(call_service(pid, resolved))] = pid
+
+            if not running:
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pid = running.pop(task)
+                try:
+                    res = task.result()
+                except Exception as e:
+                    res = {"error": str(e)}
+                responses[pid] = res
+                if on_result is not None:
+                    on_result(pid, res)
+                if not isinstance(res, dict) or "error" in res or res.get("skipped"):
+                    continue
+                context.update(res)
+                for field in res:
+                    if not has_value(context, field):
+                        continue
+                    for consumer in consumers.pop(field, ()):
+                        waiting = missing.get(consumer)
+                        if waiting is None or field not in waiting:
+                            continue
+                        waiting.discard(field)
+                        if not waiting:
+                            heapq.heappush(ready, (priority[consumer], consumer))
+    finally:
+        # Client went away or the request was cancelled: don't leave calls dangling
+        for task in running:
+            task.cancel()
+
+    for pid, fields in missing.items():
+        unresolved[pid] = [k for k in contract_map[pid].required if k in fields]
+    if unresolved:
+        logger.debug("DAG execution left services unresolved: %s", unresolved)
+    return responses, unresolved
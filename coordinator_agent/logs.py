@@ -0,0 +1,88 @@
+from typing import Any, Dict, Optional
+
+import json
+import logging
+import os
+import random
+import sys
+from datetime import datetime, timezone
+
+
+# ── config ───────────────────────────────────────────────────────────────────────
+LOG_LEVEL               = os.getenv("LOG_LEVEL", "INFO").upper()
+# "text" or "json" (one object per line)
+LOG_FORMAT              = os.getenv("LOG_FORMAT", "text")
+# fraction of DEBUG payload dumps (prompts, schemas, raw LLM output) that are emitted
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
+# ────────────────────────────────────────────────────────────────────────────────
+
+logger = logging.getLogger("coordinator")
+# Large request/response dumps; only serialized when DEBUG is enabled for it
+payload_logger = logging.getLogger("coordinator.payloads")
+
+
+class SamplingFilter(logging.Filter):
+    """Pass DEBUG records with probability `rate`; higher levels always pass."""
+
+    def __init__(self, rate: float, rng: Optional[random.Random] = None):
+        super().__init__()
+        self.rate = rate
+        self.rng = rng or random.Random()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return self.rng.random() < self.rate
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        payload = getattr(record, "payload", None)
+        if payload:
+            line += " " + json.dumps(payload, default=str, ensure_ascii=False)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload = getattr(record, "payload", None)
+        if payload:
+            entry["payload"] = payload
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def log_payload(event: str, **fields: Any) -> None:
+    """
+    Dump request/response payloads at DEBUG on `coordinator.payloads`.
+
+    Returns before building anything when DEBUG is off, so call sites pay
+    one level check in production. Serialization happens in the formatter,
+    after sampling.
+    """
+    if payload_logger.isEnabledFor(logging.DEBUG):
+        payload_logger.debug(event, extra={"payload": fields})
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, sample_rate: float = LOG_PAYLOAD_SAMPLE_RATE) -> None:
+    """Attach one stderr handler to the "coordinator" logger (idempotent)."""
+    logger.setLevel(level)
+    if not payload_logger.filters:
+        payload_logger.addFilter(SamplingFilter(sample_rate))
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(handler)
+    logger.propagate = False
@@ -1,31 +1,107 @@
+from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi import HTTPException
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from jsonschema import validate, ValidationError
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 
+import asyncio
 import json
-import os, requests, json, uuid
+import os, json, uuid
 import re
 import logging
+import time
+
+from common.trace_store import TraceStore
+from common.trace_writer import TRACE_DB_PATH, TRACE_LOG_PATH, open_trace_log
+from coordinator_agent.cache import load_embedding_cache, make_cache, save_embedding_cache
+from coordinator_agent.vector_index import BootstrapSource, ChromaSource, ServiceIndex, sync_forever
+from coordinator_agent.logs import configure_logging
+from coordinator_agent.clients import (
+    chroma_client,
+    close_clients,
+    lmstudio_client,
+    service_pool,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and compile the prompt templates up front; they hot-reload on change
+    for template in (
+        selection_system_template,
+        selection_user_template,
+        extraction_system_template,
+        planner_system_template,
+        planner_user_template,
+    ):
+        try:
+            template.text
+        except RuntimeError as e:
+            logger.warning("%s", e)
+
+    if embed_cache_path and embed_cache_backend == "memory":
+        loaded = load_embedding_cache(embed_cache, embed_cache_path)
+        logger.info("Loaded %d cached embeddings from %s", loaded, embed_cache_path)
+
+    sync_task = None
+    if search_backend == "local":
+        source = index_source()
+        try:
+            await service_index.sync(source.list_records, source.fetch_embeddings)
+        except Exception as e:
+            logger.warning("Initial service index load failed, falling back to Chroma: %s", e)
+        sync_task = asyncio.create_task(sync_forever(service_index, source, vector_index_sync_interval))
 
+    yield
 
-app = FastAPI()
+    if sync_task:
+        sync_task.cancel()
+    await close_clients()
+    trace_writer.close()
+    if embed_cache_path and embed_cache_backend == "memory":
+        save_embedding_cache(embed_cache, embed_cache_path)
+
+
+app = FastAPI(lifespan=lifespan)
 
 # ── config ───────────────────────────────────────────────────────────────────────
 chroma_services_url = os.getenv("CHROMA_AGENTS_URL", "http://chroma-services:8000")
 lmstudio_url      = os.getenv("LMSTUDIO_URL")
 if not lmstudio_url:
-    raise runtimeerror("missing lmstudio_url env var")
+    raise RuntimeError("missing lmstudio_url env var")
 
 embed_path    = os.getenv("lmstudio_embed_path", "/v1/embeddings")
 chat_path     = os.getenv("lmstudio_chat_path",  "/v1/chat/completions")
 embed_model   = os.getenv("embed_model",   "text-embedding-all-minilm-l12-v2")
 chat_model    = os.getenv("chat_model",    "swe-dev-32b-i1")
 collection        = "services"
-log_path          = "/shared/logs/trace.log"
-request_timeout   = (2, 60)   # connect, read timeouts
+log_path          = TRACE_LOG_PATH
+dispatch_max_concurrency = int(os.getenv("DISPATCH_MAX_CONCURRENCY", "4"))
+# "sequential": rerank, then extract; "speculative": both LLM calls at once;
+# "planner": one fused LLM call, falling back to "sequential" on failure
+dispatch_mode            = os.getenv("DISPATCH_MODE", "sequential")
+
+# "chroma": query chroma-services per search, "local": in-process NumPy index
+search_backend             = os.getenv("SEARCH_BACKEND", "chroma")
+# "chroma" or a directory of bootstrap JSON files
+vector_index_source        = os.getenv("VECTOR_INDEX_SOURCE", "chroma")
+vector_index_sync_interval = float(os.getenv("VECTOR_INDEX_SYNC_INTERVAL", "60"))
+# upper bounds for search requests: hits per query and queries per batch
+search_max_k               = int(os.getenv("SEARCH_MAX_K", "100"))
+search_batch_max_queries   = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "256"))
+# distance function of the Chroma collection ("hnsw:space"), reported with each hit
+chroma_distance_metric     = os.getenv("CHROMA_DISTANCE_METRIC", "l2")
+
+# rerank decision cache: "memory", "shared" (per-worker LRU + SQLite shared by all
+# workers), "sqlite" or "off"
+rerank_cache_backend = os.getenv("RERANK_CACHE_BACKEND", "memory")
+rerank_cache_size    = int(os.getenv("RERANK_CACHE_SIZE", "1024"))
+rerank_cache_ttl     = float(os.getenv("RERANK_CACHE_TTL", "3600"))
+rerank_cache_path    = os.getenv("RERANK_CACHE_PATH", "/shared/cache/decisions.sqlite")
+
+trace_stream_interval = float(os.getenv("TRACE_STREAM_INTERVAL", "0.5"))   # seconds between store polls
 
 SYSTEM_PROMPT_PATH = os.getenv("SERVICE_SELECTION_SYSTEM_PROMPT", "coordinator_agent/prompts/serviceSelectionSystem.txt")
 USER_PROMPT_PATH   = os.getenv("SERVICE_SELECTION_USER_PROMPT", "coordinator_agent/prompts/serviceSelectionUser.txt")
@@ -34,95 +110,176 @@ FULL_URL = lmstudio_url.rstrip("/") + chat_path
 # ────────────────────────────────────────────────────────────────────────────────
 
 logger = logging.getLogger("coordinator")
-logger.setLevel(logging.INFO)
+configure_logging()
 
 
 from coordinator_agent.utils import (
     build_candidates_section,
-    load_prompt,
+    decision_key,
+    selection_system_template,
+    selection_user_template,
+    extraction_system_template,
     parse_inputs,
     extract_json_like,
     extract,
     get_collection_id,
+    collection_ids,
+    embed_query,
+    embed_texts,
+    embed_cache,
+    embed_cache_backend,
+    embed_cache_path,
     log_event,
-    topo_sort_services,
-    resolve_inputs,
+    trace_writer,
     resolve_fields,
-    is_resolvable,
     resolve_with_sources,
-    allow_nulls
 )
+from coordinator_agent.contracts import merged_input_schema, registry as contract_registry
+from coordinator_agent.resilience import CallPolicy, CircuitOpenError, breakers, resilient_post
+from coordinator_agent.validation import VALIDATION_MODE as validation_mode, check, validator_cache
+from coordinator_agent.executor import execute_dag
+from coordinator_agent.metrics import (
+    cache_collector,
+    record_usage,
+    registry as metrics_registry,
+    stage_seconds,
+    start_request,
+    timed,
+)
+from coordinator_agent.planner import plan, planner_system_template, planner_user_template
 
 
+service_index = ServiceIndex()
+rerank_cache = make_cache(rerank_cache_backend, rerank_cache_size, rerank_cache_ttl, rerank_cache_path)
+trace_log = open_trace_log(log_path)
+
+
+def index_source():
+    if vector_index_source == "chroma":
+        return ChromaSource(chroma_services_url, get_collection_id)
+    return BootstrapSource(vector_index_source, embed_texts)
+
 
 
-@app.get("/api/search")
-def semantic_search(q: str, k: int = 5):
-    # 1) embed via lm studio
-    embed_url = lmstudio_url.rstrip("/") + embed_path
-    try:
-        r = requests.post(
-            embed_url,
-            json={"model": embed_model, "input": [q]},
-            timeout=request_timeout
-        )
-        r.raise_for_status()
-        body = r.json()
-        # handle both openai and lm studio shapes
-        if "data" in body:
-            emb = body["data"][0]["embedding"]
-        elif "embedding" in body:
-            emb = body["embedding"]
-        else:
-            raise runtimeerror(f"no embedding in response: keys={List(body.keys())}")
-    except exception as e:
-        raise httpexception(502, detail=f"embedding error: {e}")
 
-    # 2) query chroma
+async def query_chroma(embeddings: List[List[float]], k: int) -> List[List[Dict[str, Any]]]:
+    """One Chroma query for all embeddings; returns the hits per embedding."""
     try:
-        coll_id = get_collection_id()
-    except exception as e:
-        raise httpexception(502, detail=f"chroma error: {e}")
+        coll_id = await get_collection_id()
+    except Exception as e:
+        raise HTTPException(502, detail=f"chroma error: {e}")
 
-    query_url = f"{chroma_services_url}/api/v1/collections/{coll_id}/query"
     payload = {
-        "query_embeddings": [emb],
+        "query_embeddings": embeddings,
         "n_results": k,
         "include": ["documents", "metadatas", "distances"]
     }
-    r2 = requests.post(query_url, json=payload, timeout=request_timeout)
+    try:
+        r2 = await chroma_client().post(f"{chroma_services_url}/api/v1/collections/{coll_id}/query", json=payload)
+        if r2.status_code == 404:
+            # Collection was recreated under a new id: resolve it again and retry once
+            collection_ids.invalidate(collection)
+            coll_id = await get_collection_id()
+            r2 = await chroma_client().post(f"{chroma_services_url}/api/v1/collections/{coll_id}/query", json=payload)
+    except Exception as e:
+        raise HTTPException(502, detail=f"vector search error: {e}")
     if r2.status_code != 200:
-        raise httpexception(502, detail=f"vector search error: {r2.text}")
+        raise HTTPException(502, detail=f"vector search error: {r2.text}")
     data = r2.json()
 
-    # 3) format the results
-    results = []
-    ids       = data.get("ids", [[]])[0]
-    metadatas = data.get("metadatas", [[]])[0]
-    distances = data.get("distances", [[]])[0]
-    for i, aid in enumerate(ids):
-        results.append({
-            "id":       aid,
-            "metadata": metadatas[i],
-            "distance": distances[i]
-        })
-    return results
+    # format the results, one list per query embedding
+    all_results = []
+    for n in range(len(embeddings)):
+        ids       = (data.get("ids") or [[]] * len(embeddings))[n]
+        metadatas = (data.get("metadatas") or [[]] * len(embeddings))[n]
+        distances = (data.get("distances") or [[]] * len(embeddings))[n]
+        all_results.append([
+            {
+                "id":       aid,
+                "metadata": metadatas[i],
+                "distance": distances[i],
+                "metric":   chroma_distance_metric,
+            }
+            for i, aid in enumerate(ids)
+        ])
+    return all_results
+
+
+async def search_embeddings(embeddings: List[List[float]], k: int) -> List[List[Dict[str, Any]]]:
+    if search_backend == "local" and service_index.ready:
+        with timed("local_index_query"):
+            return service_index.query_many(embeddings, k)
+    with timed("chroma_query"):
+        return await query_chroma(embeddings, k)
+
+
+def check_k(k: Any) -> int:
+    """Reject a hit count that is not an int in 1..SEARCH_MAX_K."""
+    if isinstance(k, bool) or not isinstance(k, int) or not 1 <= k <= search_max_k:
+        raise HTTPException(400, detail=f"'k' must be an integer between 1 and {search_max_k}")
+    return k
+
+
+def check_search_batch_body(body: Dict) -> Tuple[List[str], int]:
+    """Reject malformed batch searches; returns the queries and k."""
+    queries = body.get("queries")
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q for q in queries):
+        raise HTTPException(400, detail="require 'queries' as a non-empty list of strings")
+    if len(queries) > search_batch_max_queries:
+        raise HTTPException(400, detail=f"at most {search_batch_max_queries} queries per batch")
+    return queries, check_k(body.get("k", 5))
+
+
+@app.get("/api/search")
+async def semantic_search(q: str, k: int = 5):
+    check_k(k)
+    # 1) embed via lm studio (cached per model + normalized query)
+    try:
+        emb = await embed_query(q)
+    except Exception as e:
+        raise HTTPException(502, detail=f"embedding error: {e}")
+
+    # 2) query the local index or chroma
+    return (await search_embeddings([emb], k))[0]
+
+
+@app.post("/api/search/batch")
+async def semantic_search_batch(body: Dict):
+    queries, k = check_search_batch_body(body)
+
+    try:
+        embeddings = await embed_texts(queries)
+    except Exception as e:
+        raise HTTPException(502, detail=f"embedding error: {e}")
+
+    results = await search_embeddings(embeddings, k)
+    return [{"query": q, "results": r} for q, r in zip(queries, results)]
 
 
 
 @app.post("/api/rerank")
-def rerank(body: Dict):
+async def rerank(body: Dict):
     q = body.get("query")
     candidates = body.get("candidates", [])
     if not q or not candidates:
         raise HTTPException(400, detail="require 'query' and 'candidates'")
 
-    system_prompt = load_prompt(SYSTEM_PROMPT_PATH)
-    user_template = load_prompt(USER_PROMPT_PATH)
+    try:
+        system_prompt = selection_system_template.text
+        user_digest = selection_user_template.digest
+    except RuntimeError as e:
+        raise HTTPException(500, detail=str(e))
+
     # --- 1. Build candidate description block ---
-    user_prompt = user_template \
-        .replace("{{query}}", q) \
-        .replace("{{candidates}}", build_candidates_section(candidates))
+    candidates_section = build_candidates_section(candidates)
+
+    # Same query, candidates, model and prompts at temperature 0 → same decision
+    cache_key = decision_key(q, candidates, candidates_section, chat_model, selection_system_template.digest, user_digest)
+    cached = rerank_cache.get(cache_key)
+    if cached is not None:
+        return {**cached, "cached": True}
+
+    user_prompt = selection_user_template.render(query=q, candidates=candidates_section)
 
     # --- 2. Build and send LLM request ---
     chat_url = lmstudio_url.rstrip("/") + chat_path
@@ -137,9 +294,12 @@ def rerank(body: Dict):
 
     try:
 
-        r = requests.post(chat_url, json=payload, timeout=request_timeout)
+        with timed("rerank_llm"):
+            r = await lmstudio_client().post(chat_url, json=payload)
         r.raise_for_status()
-        content = r.json().get("choices", [])[0].get("message", {}).get("content", "")
+        reply = r.json()
+        record_usage("rerank", reply)
+        content = reply.get("choices", [])[0].get("message", {}).get("content", "")
 
         try:
             picked = json.loads(content)
@@ -156,71 +316,216 @@ def rerank(body: Dict):
     except Exception as e:
         raise HTTPException(502, detail=f"rerank error: {e}")
 
-    return {
+    decision = {
         "pickids": pickids,
         "order": order,
         "reasons": reasons,
         "raw_response": content
     }
+    rerank_cache.set(cache_key, decision)
+    return {**decision, "cached": False}
 
-@app.get("/api/logs", response_class=PlainTextResponse)
-def read_logs():
-    try:
-        with open(log_path, "r") as f:
-            return f.read()
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="Log file not found")
+metrics_registry.add_collector(cache_collector(lambda: {
+    "embeddings": embed_cache.stats(),
+    "rerank": rerank_cache.stats(),
+    "validators": validator_cache.stats(),
+    **contract_registry.stats(),
+}))
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition: stage latency histograms, LLM tokens, cache counters."""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 
+@app.get("/api/services/breakers")
+def breaker_states():
+    """Circuit breaker state per service endpoint."""
+    return breakers.stats()
 
-@app.post("/api/dispatch")
-def dispatch(body: Dict):
-    query = body.get("query")
-    candidates = body.get("candidates", [])
-    if not query or not candidates:
-        raise HTTPException(400, detail="require 'query' and 'candidates'")
+@app.get("/api/cache/stats")
+def cache_stats():
+    # Per worker process; with several workers each request sees one of them
+    return {
+        "worker": os.getpid(),
+        "embeddings": embed_cache.stats(),
+        "rerank": rerank_cache.stats(),
+        **contract_registry.stats(),
+        "validators": validator_cache.stats(),
+        "trace_writer": trace_writer.stats(),
+    }
 
-    correlation_id = str(uuid.uuid4())
+_trace_store: Optional[TraceStore] = None
 
-    rerank_result = rerank({"query": query, "candidates": candidates})
-    pickids = rerank_result["pickids"]
-    reasons = rerank_result["reasons"]
-    raw_response = rerank_result.get("raw_response", "")
 
-    responses: Dict[str, Any] = {}
-    executed = set()
-    context = body.copy()
-    contract_map = {}
-    merged_props = {}
+def get_trace_store() -> TraceStore:
+    global _trace_store
+    if not TRACE_DB_PATH:
+        raise HTTPException(404, detail="Trace store disabled (TRACE_DB_PATH is empty)")
+    if _trace_store is None:
+        try:
+            _trace_store = TraceStore(TRACE_DB_PATH)
+        except Exception as e:
+            raise HTTPException(503, detail=f"Trace store unavailable: {e}")
+    return _trace_store
+
+
+@app.get("/api/traces")
+def read_traces(correlation_id: str, cursor: int = 0, limit: int = 500):
+    """Events of one dispatch, oldest first; pass `next_cursor` back as `cursor` for the next page."""
+    return get_trace_store().by_correlation(correlation_id, cursor=cursor, limit=max(1, min(limit, 1000)))
+
+
+@app.get("/api/traces/recent")
+def read_recent_traces(limit: int = 100, before: Optional[int] = None):
+    """Latest events, oldest first; pass `next_cursor` back as `before` for older pages."""
+    return get_trace_store().recent(limit=max(1, min(limit, 1000)), before=before)
+
+
+@app.get("/api/traces/correlations")
+def read_trace_correlations(limit: int = 5):
+    """Most recently active correlation ids, newest first."""
+    return get_trace_store().correlation_ids(limit=max(1, min(limit, 100)))
+
+
+@app.get("/api/traces/stream")
+async def stream_traces(request: Request, correlation_id: Optional[str] = None):
+    """
+    Server-Sent Events feed of trace events as they are appended.
+
+    With `correlation_id` the stream starts with that request's existing
+    events; without it only new events are sent. Each event carries its
+    cursor as SSE id, so a reconnecting EventSource resumes via Last-Event-ID.
+    """
+    store = get_trace_store()
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        cursor = int(last_event_id)
+    elif correlation_id:
+        cursor = 0
+    else:
+        cursor = await asyncio.to_thread(store.last_cursor)
+
+    async def events():
+        nonlocal cursor
+        idle = 0.0
+        while not await request.is_disconnected():
+            batch = await asyncio.to_thread(store.after, cursor, correlation_id)
+            for event in batch:
+                cursor = event["_cursor"]
+                yield f"id: {cursor}\ndata: {json.dumps(event)}\n\n"
+            if batch:
+                idle = 0.0
+                continue
+            await asyncio.sleep(trace_stream_interval)
+            idle += trace_stream_interval
+            if idle >= 15:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                idle = 0.0
 
-    for svc in candidates:
-        pid = svc["id"]
-        if pid not in pickids:
-            continue
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        contract_input = json.loads(svc["metadata"].get("contract_input", "{}"))
-        contract_output = json.loads(svc["metadata"].get("contract_output", "{}"))
 
-        contract_map[pid] = {
-            "input": contract_input,
-            "output": contract_output
-        }
+@app.get("/api/logs", response_class=PlainTextResponse)
+def read_logs(since_offset: Optional[int] = None):
+    """
+    The raw trace log, across rotated (and compressed) segments. With
+    `since_offset` only the complete lines appended after that logical byte
+    offset are returned; `X-Log-Offset` holds the offset to pass next time,
+    and `X-Log-Reset: 1` signals the offset is no longer retained and reading
+    restarted at the oldest segment.
+    """
+    try:
+        if since_offset is None:
+            return StreamingResponse(trace_log.read_all(), media_type="text/plain; charset=utf-8")
+
+        text, offset, reset = trace_log.read_since(since_offset)
+        return PlainTextResponse(
+            text,
+            headers={"X-Log-Offset": str(offset), "X-Log-Reset": "1" if reset else "0"},
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Log file not found")
+
+
+def check_dispatch_body(body: Dict) -> str:
+    """Reject malformed dispatch requests; returns the dispatch mode."""
+    if not body.get("query") or not body.get("candidates"):
+        raise HTTPException(400, detail="require 'query' and 'candidates'")
+    mode = body.get("mode", dispatch_mode)
+    if mode not in ("sequential", "speculative", "planner"):
+        raise HTTPException(400, detail=f"unknown dispatch mode '{mode}'")
+    return mode
+
+
+async def dispatch_events(body: Dict) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Run one dispatch, yielding `(event, data)` as each stage completes:
+    "rerank" (the picked services), "extracted" (the fields), one
+    "response" per service as it lands, "skipped" (everything that did not
+    run) and finally "done" with the complete `/api/dispatch` result.
+    """
+    mode = check_dispatch_body(body)
+    query = body["query"]
+    candidates = body["candidates"]
+
+    correlation_id = str(uuid.uuid4())
+    started = time.perf_counter()
+    start_request()
 
-        for k, v in contract_input.get("properties", {}).items():
-            merged_props[k] = v
+    all_contracts = contract_registry.for_candidates(candidates)
 
-    schema = {"type": "object", "properties": merged_props}
-    schema = allow_nulls(schema)
-    result = extract(prompt=query, schema=schema)
+    planned = None
+    planner_fallback = None
+    if mode == "planner":
+        # One LLM call for selection + extraction; any failure falls back to the two-call path
+        try:
+            planned = await plan(query, candidates, all_contracts, cache=rerank_cache)
+        except Exception as e:
+            logger.warning("Fused planner failed, falling back to two calls: %s", e)
+            planner_fallback = str(e)
 
-    resolvable_services = [
-        pid for pid in pickids
-        if pid in contract_map and is_resolvable(contract_map[pid]["input"], context)
-    ]
+    extraction = None
+    if mode == "speculative":
+        # Extract against the union schema of all candidates while rerank is still running
+        extraction = asyncio.create_task(extract(prompt=query, schema=merged_input_schema(all_contracts.values())))
 
+    try:
+        if planned:
+            rerank_result = planned
+        else:
+            rerank_result = await rerank({"query": query, "candidates": candidates})
+        pickids = rerank_result["pickids"]
+        reasons = rerank_result["reasons"]
+        raw_response = rerank_result.get("raw_response", "")
+        yield "rerank", {
+            "correlation_id": correlation_id,
+            "pickids": pickids,
+            "reasons": reasons,
+            "mode": mode,
+            "planner_fallback": planner_fallback,
+        }
 
+        context = body.copy()
+        contract_map = {pid: c for pid, c in all_contracts.items() if pid in pickids}
+        schema = merged_input_schema(contract_map.values())
+
+        if planned or extraction:
+            # Keep only the fields the picked services actually take
+            extracted = planned["fields"] if planned else await extraction
+            result = {k: extracted.get(k) for k in schema["properties"]}
+        else:
+            result = await extract(prompt=query, schema=schema)
+    finally:
+        # Rerank failed or the consumer stopped listening: drop the speculative call
+        if extraction and not extraction.done():
+            extraction.cancel()
 
     cleaned_result = {
         k: v for k, v in result.items()
@@ -230,138 +535,160 @@ def dispatch(body: Dict):
 
     if not cleaned_result:
         raise HTTPException(400, detail="No usable values extracted from query")
+    yield "extracted", {"fields": cleaned_result}
 
+    services = {c["id"]: c for c in candidates}
 
-    resolvable = {
-        pid for pid in pickids
-        if pid in contract_map and is_resolvable(contract_map[pid]["input"], context)
-    }
-
-    try:
-        order = topo_sort_services(list(resolvable), contract_map, context.keys())
-    except RuntimeError as e:
-        # If resolution still fails (e.g. circular deps), skip topo and rely on retry loop
-        print(f"[dispatch()] Topo sort failed: {e}")
-        order = list(resolvable)
-
-
-
-
-    prev_ctx_keys = set(context.keys())
-    retries = 0
-    max_retries = 5
+    # The executor orders by dependencies itself and rejects unresolvable services up front
+    order = [pid for pid in pickids if pid in contract_map]
 
-    while True:
-        progress = False
-        unresolved = []
+    async def call_service(pid: str, resolved: Dict[str, Any]) -> Dict[str, Any]:
+        svc = services[pid]
+        contract = contract_map[pid]
 
-        remaining = [pid for pid in pickids if pid not in executed]
-        if not remaining:
-            break
-
-        for pid in remaining:
-            if pid in executed:
-                continue
-
-            svc = next((c for c in candidates if c["id"] == pid), None)
-            if not svc:
-                continue
-
-            contract = contract_map.get(pid, {})
-            contract_input = contract.get("input", {})
-            props = contract_input.get("properties", {})
-            raw_required = contract_input.get("required")
-            required = raw_required or [
-                k for k, v in props.items()
-                if not (isinstance(v.get("type"), list) and "null" in v["type"])
-            ]
-
-            resolved = {
-                k: context[k] for k in required
-                if k in context and context[k] is not None and str(context[k]).lower() != "null"
-            }
-
-            missing = [k for k in required if k not in resolved]
-            if missing:
-                unresolved.append((pid, missing))
-                continue
-
-            url = svc["metadata"]["endpoint"]
-            for k, v in resolved.items():
-                url = url.replace(f"{{{k}}}", str(v))
-
-            headers = {
-                "content-type": "application/json",
-                "x-correlation-id": correlation_id,
-                "x-jwt": "{}"
+        input_errors = check(contract.input_validator, resolved, f"Request to {pid}")
+        if input_errors and validation_mode == "strict":
+            res = {
+                "skipped": True,
+                "violations": input_errors,
+                "reason": "Request violates the service's input contract."
             }
+            log_event(correlation_id, svc, resolved, res, reason=res["reason"], query=query)
+            return res
+
+        endpoint = svc["metadata"]["endpoint"]
+        policy = CallPolicy.from_metadata(svc["metadata"])
+        url = endpoint
+        for k, v in resolved.items():
+            url = url.replace(f"{{{k}}}", str(v))
+
+        headers = {
+            "content-type": "application/json",
+            "x-correlation-id": correlation_id,
+            "x-jwt": "{}"
+        }
 
+        try:
+            with timed("service_call", service=pid):
+                pool = service_pool()
+                sub_r = await resilient_post(
+                    pool.client.post, endpoint, url, policy, slot=pool.slot(url), json=resolved, headers=headers
+                )
+            sub_r.raise_for_status()
             try:
-                sub_r = requests.post(url, json=resolved, headers=headers, timeout=request_timeout)
-                sub_r.raise_for_status()
-                try:
-                    res = sub_r.json()
-                except ValueError:
-                    res = {"error": "invalid JSON", "raw": sub_r.text[:200]}
-            except Exception as e:
-                res = {"error": str(e)}
-
-            responses[pid] = res
-            executed.add(pid)
-            context.update(res)
-
-            log_event(
-                correlation_id,
-                svc,
-                resolved,
-                res,
-                reason=reasons.get(pid, "executed after dependency resolution"),
-                query=query
-            )
-
-            progress = True
-
-        current_ctx_keys = set(context.keys())
-
-        if not progress and current_ctx_keys == prev_ctx_keys:
-            retries += 1
-        else:
-            retries = 0
-
-        prev_ctx_keys = current_ctx_keys
-
-        if retries >= max_retries:
-            break
-
-        if not progress:
-            try:
-                initial_fields = set(context.keys())
-                order = topo_sort_services(pickids, contract_map, initial_fields)
-            except RuntimeError as e:
-                break
-
-    for pid, missing in unresolved:
+                res = sub_r.json()
+            except ValueError:
+                res = {"error": "invalid JSON", "raw": sub_r.text[:200]}
+        except CircuitOpenError as e:
+            res = {"skipped": True, "reason": f"Service unavailable: {e}."}
+            log_event(correlation_id, svc, resolved, res, reason=res["reason"], query=query)
+            return res
+        except asyncio.TimeoutError:
+            res = {"error": f"no response within {policy.timeout:g}s latency budget"}
+        except Exception as e:
+            res = {"error": str(e)}
+
+        if "error" not in res:
+            output_errors = check(contract.output_validator, res, f"Response of {pid}")
+            if output_errors and validation_mode == "strict":
+                res = {"error": "Response violates the service's output contract", "violations": output_errors, "response": res}
+
+        log_event(
+            correlation_id,
+            svc,
+            resolved,
+            res,
+            reason=reasons.get(pid, "executed after dependency resolution"),
+            query=query
+        )
+        return res
+
+    # Responses are handed over through a queue so they can be yielded as they land
+    landed: asyncio.Queue = asyncio.Queue()
+    execution = asyncio.create_task(execute_dag(
+        order,
+        contract_map,
+        context,
+        call_service,
+        max_concurrency=dispatch_max_concurrency,
+        on_result=lambda pid, res: landed.put_nowait((pid, res)),
+    ))
+    execution.add_done_callback(lambda _: landed.put_nowait(None))
+    try:
+        while (item := await landed.get()) is not None:
+            pid, res = item
+            yield "response", {"service": pid, "response": res}
+        responses, unresolved = execution.result()
+    finally:
+        # Consumer stopped listening (client disconnect): stop calling services
+        execution.cancel()
+
+    for pid, missing in unresolved.items():
         skip_entry = {
             "skipped": True,
             "missing_inputs": missing,
-            "reason": "Unresolvable inputs after dependency resolution loop."
+            "reason": "Unresolvable inputs after dependency resolution."
         }
-        svc = next((c for c in candidates if c["id"] == pid), None)
-        if svc:
-            log_event(
-                correlation_id,
-                svc,
-                context,
-                skip_entry,
-                reason=skip_entry["reason"],
-                query=query
-            )
+        log_event(
+            correlation_id,
+            services[pid],
+            context,
+            skip_entry,
+            reason=skip_entry["reason"],
+            query=query
+        )
         responses[pid] = skip_entry
 
-    return {
+    skipped = {k: v for k, v in responses.items() if v.get("skipped")}
+    yield "skipped", {"skipped": skipped}
+
+    stage_seconds.observe(time.perf_counter() - started, stage="dispatch", service="")
+    yield "done", {
         "pickids": pickids,
         "reasons": reasons,
         "responses": responses,
-        "skipped": {k: v for k, v in responses.items() if v.get("skipped")},
+        "skipped": skipped,
+        "mode": mode,
+        "planner_fallback": planner_fallback,
         "llm_raw": raw_response
     }
+
+
+@app.post("/api/dispatch")
+async def dispatch(body: Dict):
+    result = None
+    async for event, data in dispatch_events(body):
+        if event == "done":
+            result = data
+    return result
+
+
+@app.post("/api/dispatch/stream")
+async def dispatch_stream(body: Dict, format: str = "sse"):
+    """
+    `/api/dispatch` as a stream of its stage events (see `dispatch_events()`),
+    as Server-Sent Events or, with `format=ndjson`, one JSON object per line.
+    Failures after the stream has started arrive as an "error" event.
+    """
+    check_dispatch_body(body)
+
+    def encode(event: str, data: Dict[str, Any]) -> str:
+        if format == "ndjson":
+            return json.dumps({"event": event, "data": data}, default=str) + "\n"
+        return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    async def events():
+        try:
+            async for event, data in dispatch_events(body):
+                yield encode(event, data)
+        except HTTPException as e:
+            yield encode("error", {"status": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logger.exception("Streaming dispatch failed")
+            yield encode("error", {"status": 500, "detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson" if format == "ndjson" else "text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
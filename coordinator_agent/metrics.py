@@ -0,0 +1,178 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import bisect
+import threading
+import time
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values → (per-bucket counts, sum, count)
+        self._series: Dict[LabelValues, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    le = _labels(self.labelnames, key, 'le="%g"' % bound)
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = _labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    """Metrics plus collectors (callables returning exposition lines) rendered on /metrics."""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[str]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.register(Histogram(
+    "coordinator_stage_seconds",
+    "Duration of coordinator pipeline stages.",
+    ("stage", "service"),
+))
+llm_tokens = registry.register(Counter(
+    "coordinator_llm_tokens_total",
+    "Tokens reported in the usage block of LLM responses.",
+    ("call", "kind"),
+))
+
+
+# ── per-request spans ────────────────────────────────────────────────────────────
+
+_spans: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("coordinator_spans", default=None)
+
+
+def start_request() -> None:
+    """Start collecting spans for the current request (and the tasks it spawns)."""
+    _spans.set([])
+
+
+def spans() -> List[Dict[str, Any]]:
+    """Spans recorded so far in the current request."""
+    current = _spans.get()
+    return list(current) if current else []
+
+
+@contextmanager
+def timed(stage: str, service: str = "") -> Iterator[None]:
+    """Observe the duration of the block in the stage histogram and as a request span."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage, service=service)
+        current = _spans.get()
+        if current is not None:
+            span: Dict[str, Any] = {"stage": stage, "ms": round(elapsed * 1000, 2)}
+            if service:
+                span["service"] = service
+            current.append(span)
+
+
+def record_usage(call: str, body: Dict[str, Any]) -> None:
+    """Count prompt/completion tokens from an OpenAI-style `usage` block, if present."""
+    usage = body.get("usage") if isinstance(body, dict) else None
+    if not isinstance(usage, dict):
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if isinstance(usage.get(kind), (int, float)):
+            llm_tokens.inc(usage[kind], call=call, kind=kind.split("_")[0])
+
+
+def cache_collector(cache_stats: Callable[[], Dict[str, Dict[str, Any]]]) -> Callable[[], List[str]]:
+    """Collector exposing hits, misses and size from `cache_stats()` (cache name → `stats()` dict)."""
+    def collect() -> List[str]:
+        stats = cache_stats()
+        lines = []
+        for metric, key, kind in (
+            ("coordinator_cache_hits_total", "hits", "counter"),
+            ("coordinator_cache_misses_total", "misses", "counter"),
+            ("coordinator_cache_size", "size", "gauge"),
+        ):
+            lines.append(f"# TYPE {metric} {kind}")
+            for name, s in sorted(stats.items()):
+                lines.append(f'{metric}{{cache="{_escape(name)}"}} {s.get(key, 0)}')
+        return lines
+    return collect
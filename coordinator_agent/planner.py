@@ -0,0 +1,122 @@
+from typing import Any, Dict, List
+
+import json
+import logging
+import os
+
+from coordinator_agent.cache import LRUCache
+from coordinator_agent.clients import lmstudio_client
+from coordinator_agent.contracts import Contract, merged_input_schema
+from coordinator_agent.metrics import record_usage, timed
+from coordinator_agent.templates import PromptTemplate
+from coordinator_agent.validation import get_validator
+from coordinator_agent.utils import (
+    FULL_URL,
+    build_candidates_section,
+    chat_model,
+    decision_key,
+    extract_json_like,
+)
+
+
+# ── config ───────────────────────────────────────────────────────────────────────
+PLANNER_SYSTEM_PROMPT_PATH = os.getenv("PLANNER_SYSTEM_PROMPT", "coordinator_agent/prompts/plannerSystem.txt")
+PLANNER_USER_PROMPT_PATH   = os.getenv("PLANNER_USER_PROMPT", "coordinator_agent/prompts/plannerUser.txt")
+# "json_schema": ask the server for structured output, "none": rely on the prompt only
+planner_response_format    = os.getenv("PLANNER_RESPONSE_FORMAT", "json_schema")
+# ────────────────────────────────────────────────────────────────────────────────
+
+logger = logging.getLogger("coordinator")
+
+planner_system_template = PromptTemplate(PLANNER_SYSTEM_PROMPT_PATH)
+planner_user_template   = PromptTemplate(PLANNER_USER_PROMPT_PATH)
+
+# (template digest, canonical schema) → rendered planner system prompt
+planner_prompt_cache = LRUCache(maxsize=256)
+
+
+def plan_schema(candidate_ids: List[str], fields_schema: dict) -> dict:
+    """Combined schema for the fused rerank + extraction answer."""
+    return {
+        "type": "object",
+        "required": ["pickids", "fields"],
+        "properties": {
+            "pickids": {"type": "array", "items": {"type": "string", "enum": candidate_ids}},
+            "order": {"type": "array", "items": {"type": "string", "enum": candidate_ids}},
+            "reasons": {"type": "object", "additionalProperties": {"type": "string"}},
+            "fields": fields_schema,
+        },
+    }
+
+
+def render_planner_prompt(schema: dict) -> str:
+    key = (planner_system_template.digest, json.dumps(schema, sort_keys=True))
+    system_prompt = planner_prompt_cache.get(key)
+    if system_prompt is None:
+        system_prompt = planner_system_template.render(schema=json.dumps(schema, indent=2))
+        planner_prompt_cache.set(key, system_prompt)
+    return system_prompt
+
+
+async def plan(query: str, candidates: List[Dict], contracts: Dict[str, Contract], cache=None) -> Dict[str, Any]:
+    """
+    One chat completion that picks services and extracts their input fields.
+
+    Returns `pickids`, `order`, `reasons`, `fields` and `raw_response`.
+    Raises on any transport, parse or schema error so the caller can fall
+    back to the two-call path.
+    """
+    candidate_ids = [c["id"] for c in candidates]
+    schema = plan_schema(candidate_ids, merged_input_schema(contracts.values()))
+    system_prompt = render_planner_prompt(schema)
+    candidates_section = build_candidates_section(candidates)
+
+    cache_key = decision_key(
+        query, candidates, candidates_section, chat_model,
+        planner_system_template.digest, planner_user_template.digest,
+    )
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+    payload: Dict[str, Any] = {
+        "model": chat_model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": planner_user_template.render(query=query, candidates=candidates_section)},
+        ],
+        "temperature": 0,
+    }
+    if planner_response_format == "json_schema":
+        payload["response_format"] = {
+            "type": "json_schema",
+            "json_schema": {"name": "service_plan", "schema": schema},
+        }
+
+    with timed("planner_llm"):
+        r = await lmstudio_client().post(FULL_URL, json=payload)
+    r.raise_for_status()
+    body = r.json()
+    record_usage("planner", body)
+    content = body["choices"][0]["message"]["content"]
+
+    try:
+        planned = json.loads(content)
+    except json.JSONDecodeError:
+        planned = json.loads(extract_json_like(content))
+
+    get_validator(schema).validate(planned)
+    if not planned["pickids"]:
+        raise RuntimeError("no pickids returned")
+
+    decision = {
+        "pickids": planned["pickids"],
+        "order": planned.get("order") or planned["pickids"],
+        "reasons": planned.get("reasons", {}),
+        "fields": planned["fields"],
+        "raw_response": content,
+    }
+    if cache is not None:
+        cache.set(cache_key, decision)
+    return {**decision, "cached": False}
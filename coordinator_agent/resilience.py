@@ -0,0 +1,211 @@
+from typing import Any, AsyncContextManager, Awaitable, Callable, Dict, Optional
+
+import asyncio
+import contextlib
+import os
+import time
+
+import httpx
+
+
+# ── config ───────────────────────────────────────────────────────────────────────
+# latency budget per service call (seconds); metadata "timeout_ms" overrides it
+service_timeout           = float(os.getenv("SERVICE_TIMEOUT", "10"))
+# idempotent services (metadata "idempotent": true) get a second request after this
+# long without an answer; metadata "hedge_after_ms" overrides it, 0 disables hedging
+service_hedge_delay       = float(os.getenv("SERVICE_HEDGE_DELAY", "1.0"))
+breaker_failure_threshold = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+breaker_reset_timeout     = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose breaker is open."""
+
+
+def _flag(value: Any) -> bool:
+    return value is True or str(value).strip().lower() in ("true", "1", "yes")
+
+
+def _seconds(metadata: Dict[str, Any], key: str, default: float) -> float:
+    try:
+        return float(metadata[key]) / 1000.0
+    except (KeyError, TypeError, ValueError):
+        return default
+
+
+class CallPolicy:
+    """Latency budget and hedging settings of one service, read from its registry metadata."""
+
+    __slots__ = ("timeout", "hedge_after")
+
+    def __init__(self, timeout: float, hedge_after: Optional[float]):
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+
+    @classmethod
+    def from_metadata(cls, metadata: Dict[str, Any]) -> "CallPolicy":
+        timeout = _seconds(metadata, "timeout_ms", service_timeout)
+        hedge_after = None
+        if _flag(metadata.get("idempotent")):
+            hedge_after = _seconds(metadata, "hedge_after_ms", service_hedge_delay) or None
+        if hedge_after is not None and hedge_after >= timeout:
+            hedge_after = None
+        return cls(timeout, hedge_after)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker for one endpoint.
+
+    After `failure_threshold` failures in a row the breaker opens and calls
+    fail fast for `reset_timeout` seconds. Then a single probe is let
+    through ("half_open"): success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = breaker_failure_threshold,
+        reset_timeout: float = breaker_reset_timeout,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+        self._probing = False
+
+    def release(self) -> None:
+        """Give up a half-open probe without a verdict (e.g. the call was cancelled)."""
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+
+class BreakerRegistry:
+    """One `CircuitBreaker` per endpoint template (e.g. ".../customer/{customer_id}")."""
+
+    def __init__(self, **breaker_kwargs: Any):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._kwargs = breaker_kwargs
+
+    def get(self, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(**self._kwargs)
+        return breaker
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {endpoint: b.stats() for endpoint, b in self._breakers.items()}
+
+
+breakers = BreakerRegistry()
+
+
+async def _hedged(send: Callable[[], Awaitable[httpx.Response]], hedge_after: float) -> httpx.Response:
+    """Run `send()`; if it has not finished after `hedge_after` seconds, race a second copy."""
+    first = asyncio.ensure_future(send())
+    try:
+        done, _ = await asyncio.wait({first}, timeout=hedge_after)
+        if done:
+            return first.result()
+    except BaseException:
+        first.cancel()
+        raise
+
+    pending = {first, asyncio.ensure_future(send())}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def resilient_post(
+    post: Callable[..., Awaitable[httpx.Response]],
+    endpoint: str,
+    url: str,
+    policy: CallPolicy,
+    slot: Optional[AsyncContextManager] = None,
+    **kwargs: Any,
+) -> httpx.Response:
+    """
+    POST `url` within the policy's latency budget, guarded by the breaker of
+    `endpoint`.
+
+    `slot` (e.g. the per-host semaphore of `ServicePool`) is acquired before
+    the budget starts, so time spent queueing locally neither eats into the
+    budget nor counts against the endpoint; a hedged copy shares the slot.
+
+    Raises `CircuitOpenError` without calling when the breaker is open, and
+    `asyncio.TimeoutError` when the budget (including any hedge) runs out.
+    Timeouts, transport errors and 5xx responses count as breaker failures.
+    """
+    breaker = breakers.get(endpoint)
+    if not breaker.allow():
+        raise CircuitOpenError(
+            f"circuit open after {breaker.failures} consecutive failures; "
+            f"retrying in at most {breaker.reset_timeout:g}s"
+        )
+
+    kwargs.setdefault("timeout", httpx.Timeout(policy.timeout))
+
+    async def send() -> httpx.Response:
+        return await post(url, **kwargs)
+
+    try:
+        async with slot or contextlib.nullcontext():
+            if policy.hedge_after is None:
+                response = await asyncio.wait_for(send(), policy.timeout)
+            else:
+                response = await asyncio.wait_for(_hedged(send, policy.hedge_after), policy.timeout)
+    except asyncio.CancelledError:
+        # The caller went away; says nothing about the endpoint's health
+        breaker.release()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
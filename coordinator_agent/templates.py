@@ -0,0 +1,56 @@
+from typing import List, NamedTuple, Optional, Tuple
+
+import hashlib
+import re
+
+from common.watched_file import WatchedFile
+
+
+PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class CompiledPrompt(NamedTuple):
+    text: str
+    digest: str
+    segments: List[Tuple[str, Optional[str]]]
+
+
+def compile_prompt(text: str) -> CompiledPrompt:
+    """Split `text` into (literal, placeholder name) segments."""
+    segments: List[Tuple[str, Optional[str]]] = []
+    pos = 0
+    for match in PLACEHOLDER.finditer(text):
+        segments.append((text[pos:match.start()], match.group(1)))
+        pos = match.end()
+    segments.append((text[pos:], None))
+    return CompiledPrompt(text, hashlib.sha256(text.encode("utf-8")).hexdigest(), segments)
+
+
+class PromptTemplate:
+    """
+    A prompt file compiled once into literal/placeholder segments.
+
+    Reloaded through `WatchedFile` when the file changes. `render()`
+    substitutes all `{{name}}` placeholders in a single pass.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self._file = WatchedFile(path, compile_prompt, check_interval, what="prompt")
+
+    @property
+    def text(self) -> str:
+        return self._file.value.text
+
+    @property
+    def digest(self) -> str:
+        """sha256 of the current template text, e.g. for cache keys."""
+        return self._file.value.digest
+
+    def render(self, **values: str) -> str:
+        parts = []
+        for literal, name in self._file.value.segments:
+            parts.append(literal)
+            if name is not None:
+                parts.append(str(values[name]) if name in values else f"{{{{{name}}}}}")
+        return "".join(parts)
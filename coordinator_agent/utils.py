@@ -3,35 +3,62 @@ from datetime import datetime
 from fastapi import FastAPI, HTTPException
 from fastapi import HTTPException
 from fastapi.responses import PlainTextResponse
-from jsonschema import validate, ValidationError
 from typing import List, Dict, Any
-from typing import Set
+from typing import Awaitable, Callable, Optional, Set
 
+import asyncio
+import hashlib
 import json
-import os, requests, json, uuid
+import logging
+import os, json, uuid
 import re
-
+import time
+import unicodedata
+
+from common.trace_writer import TRACE_LOG_PATH, get_trace_writer
+from coordinator_agent.cache import LRUCache, make_cache
+from coordinator_agent.contracts import (
+    Contract,
+    has_value,
+    registry as contract_registry,
+    required_inputs,
+)
+from coordinator_agent.executor import dependency_order
+from coordinator_agent.logs import log_payload
+from coordinator_agent.metrics import record_usage, spans, timed
+from coordinator_agent.templates import PromptTemplate
+from coordinator_agent.validation import VALIDATION_MODE as validation_mode, check, get_validator
+from coordinator_agent.clients import chroma_client, lmstudio_client
 
 
 # ── config ───────────────────────────────────────────────────────────────────────
 chroma_services_url = os.getenv("CHROMA_AGENTS_URL", "http://chroma-services:8000")
 lmstudio_url      = os.getenv("LMSTUDIO_URL")
 if not lmstudio_url:
-    raise runtimeerror("missing lmstudio_url env var")
+    raise RuntimeError("missing lmstudio_url env var")
 
 embed_path    = os.getenv("lmstudio_embed_path", "/v1/embeddings")
 chat_path     = os.getenv("lmstudio_chat_path",  "/v1/chat/completions")
 embed_model   = os.getenv("embed_model",   "text-embedding-all-minilm-l12-v2")
 chat_model    = os.getenv("chat_model",    "swe-dev-32b-i1")
 collection        = "services"
-log_path          = "/shared/logs/trace.log"
-request_timeout   = (2, 60)   # connect, read timeouts
+collection_id_ttl = float(os.getenv("CHROMA_COLLECTION_ID_TTL", "300"))
+log_path          = TRACE_LOG_PATH
+embed_cache_size  = int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+# memory | shared (per-worker LRU + SQLite file shared by all workers) | sqlite | off
+embed_cache_backend = os.getenv("EMBED_CACHE_BACKEND", "memory")
+embed_cache_db_path = os.getenv("EMBED_CACHE_DB_PATH", "/shared/cache/embeddings.sqlite")
+embed_cache_path  = os.getenv("EMBED_CACHE_PATH", "")   # memory backend: JSON-lines snapshot; empty: none
+embed_batch_size  = int(os.getenv("EMBED_BATCH_SIZE", "256"))
 
 SYSTEM_PROMPT_PATH = os.getenv("SERVICE_SELECTION_SYSTEM_PROMPT", "coordinator_agent/prompts/serviceSelectionSystem.txt")
 USER_PROMPT_PATH   = os.getenv("SERVICE_SELECTION_USER_PROMPT", "coordinator_agent/prompts/serviceSelectionUser.txt")
+EXTRACTION_PROMPT_PATH = os.getenv("EXTRACTION_SYSTEM_PROMPT", "coordinator_agent/prompts/extractionSystem.txt")
 
 FULL_URL = lmstudio_url.rstrip("/") + chat_path
 
+logger = logging.getLogger("coordinator")
+
 
 from typing import Tuple
 
@@ -77,103 +104,201 @@ def extract_json_like(content: str) -> str:
     match = re.search(r"\{.*\}", content, re.DOTALL)
     return match.group(0) if match else "{}"
 
-def allow_nulls(schema):
-    """Recursively update the schema to allow null values for all properties."""
-    if not isinstance(schema, dict):
-        return schema
+selection_system_template  = PromptTemplate(SYSTEM_PROMPT_PATH)
+selection_user_template    = PromptTemplate(USER_PROMPT_PATH)
+extraction_system_template = PromptTemplate(EXTRACTION_PROMPT_PATH)
 
-    if schema.get("type") == "object" and "properties" in schema:
-        for key, prop in schema["properties"].items():
-            if "type" in prop:
-                current_type = prop["type"]
-                if isinstance(current_type, str):
-                    prop["type"] = [current_type, "null"]
-                elif isinstance(current_type, list) and "null" not in current_type:
-                    prop["type"].append("null")
-            schema["properties"][key] = allow_nulls(prop)
+# id(schema) → (schema, template digest, rendered extraction system prompt).
+# Merged schemas are shared by the ContractRegistry, so the same picked services
+# hand in the same object; the entry holds it, which keeps its id from being reused.
+extraction_prompt_cache = LRUCache(maxsize=256)
 
-    if schema.get("type") == "array" and "items" in schema:
-        schema["items"] = allow_nulls(schema["items"])
 
-    return schema
+def render_extraction_prompt(schema: dict) -> str:
+    digest = extraction_system_template.digest
+    entry = extraction_prompt_cache.get(id(schema))
+    if entry is None or entry[0] is not schema or entry[1] != digest:
+        entry = (schema, digest, extraction_system_template.render(schema=json.dumps(schema, indent=2)))
+        extraction_prompt_cache.set(id(schema), entry)
+    return entry[2]
 
-def extract(prompt: str, schema: dict) -> dict:
+
+async def extract(prompt: str, schema: dict) -> dict:
     """
     Extract structured JSON from a prompt using an LLM, matching the given schema.
     All fields should be considered optional and returned as null if not extractable.
     """
-
-    # Log incoming prompt and schema
-    print("\n[extract()] Prompt to LLM:")
-    print(prompt)
-    print("\n[extract()] Schema used:")
-    print(json.dumps(schema, indent=2))
-
-    system_prompt = f"""You are a strict JSON extractor.
-
-    Your task is to extract only explicitly stated or clearly implied values from the user's input, based on the following JSON schema:
-
-    {json.dumps(schema, indent=2)}
-
-    Guidelines:
-    - Prefer extracting values over returning null if the user's intent is reasonably clear and matches the schema type.
-    - For example: "I am user 2345" → "customer_id": 2345 is valid.
-    - Normalize common variants if unambiguous (e.g., German city names like "Munic" → "MUC", or dates like "4. Mai 2025" → "2025-05-04").
-
-    Rules:
-    - Do NOT guess or fabricate values.
-    - Do NOT infer unstated values (e.g., don't assume vehicle type unless mentioned).
-    - Return a single valid JSON object only. No text, markdown, code blocks, or explanations.
-
-    Important:
-    - If a value is missing, ambiguous, or not explicitly derivable, return null.
-    - Return only fields defined in the schema. Ignore irrelevant content.
-    """
+    system_prompt = render_extraction_prompt(schema)
 
     messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": prompt}
     ]
-    print("\n[extract()] SYSTEM Prompt to LLM:")
-    print(system_prompt)
+    log_payload("extract request", prompt=prompt, schema=schema, system_prompt=system_prompt)
 
     try:
-        response = requests.post(FULL_URL, json={
-            "model": chat_model,
-            "messages": messages,
-            "temperature": 0.0,
-        }, timeout=request_timeout)
+        with timed("extract_llm"):
+            response = await lmstudio_client().post(FULL_URL, json={
+                "model": chat_model,
+                "messages": messages,
+                "temperature": 0.0,
+            })
 
         response.raise_for_status()
-        content = response.json()["choices"][0]["message"]["content"]
+        body = response.json()
+        record_usage("extract", body)
+        content = body["choices"][0]["message"]["content"]
 
-        print("\n[extract()] LLM raw response:")
-        print(content)
+        log_payload("extract response", content=content)
 
         result = json.loads(content)
 
-        # Validate
-        try:
-            validate(instance=result, schema=schema)
-        except ValidationError as e:
-            print(f"\n[extract()] ❌ Validation failed:\n{e}")
-            raise
+        # Validate; only "strict" changes the outcome, "warn" just logs
+        errors = check(get_validator(schema), result, "Extraction")
+        if errors and validation_mode == "strict":
+            raise ValueError(f"extraction violates its schema: {errors}")
 
         return result
 
     except Exception as e:
-        print(f"\n[extract()] ❌ LLM extraction failed: {e}")
+        logger.warning("LLM extraction failed: %s", e)
         return {k: None for k in schema.get("properties", {}).keys()}
 
 
 
-def get_collection_id() -> str:
-    resp = requests.get(f"{chroma_services_url}/api/v1/collections", timeout=request_timeout)
+embed_cache = make_cache(embed_cache_backend, embed_cache_size, None, embed_cache_db_path)
+trace_writer = get_trace_writer()
+
+
+def normalize_query(text: str) -> str:
+    """Canonical form used as embedding cache key: NFKC, case-folded, single-spaced."""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+async def embed_texts(texts: List[str]) -> List[List[float]]:
+    """
+    Embed many texts with one embeddings request.
+
+    Cached texts are served from `embed_cache`; the remaining distinct texts
+    are sent together (in chunks of `embed_batch_size`) and cached.
+    """
+    keys = [(embed_model, normalize_query(t)) for t in texts]
+    found: Dict[Tuple[str, str], List[float]] = {}
+    misses: Dict[Tuple[str, str], str] = {}
+    for key, text in zip(keys, texts):
+        if key in found or key in misses:
+            continue
+        emb = embed_cache.get(key)
+        if emb is not None:
+            found[key] = emb
+        else:
+            misses[key] = text
+
+    miss_keys = list(misses)
+    for start in range(0, len(miss_keys), embed_batch_size):
+        chunk = miss_keys[start:start + embed_batch_size]
+        with timed("embed"):
+            r = await lmstudio_client().post(
+                lmstudio_url.rstrip("/") + embed_path,
+                json={"model": embed_model, "input": [misses[key] for key in chunk]},
+            )
+        r.raise_for_status()
+        body = r.json()
+        record_usage("embed", body)
+        # handle both openai and lm studio shapes
+        if "data" in body:
+            data = sorted(body["data"], key=lambda d: d.get("index", 0))
+            embeddings = [d["embedding"] for d in data]
+        elif "embedding" in body and len(chunk) == 1:
+            embeddings = [body["embedding"]]
+        else:
+            raise RuntimeError(f"no embedding in response: keys={list(body.keys())}")
+        if len(embeddings) != len(chunk):
+            raise RuntimeError(f"expected {len(chunk)} embeddings, got {len(embeddings)}")
+
+        for key, emb in zip(chunk, embeddings):
+            embed_cache.set(key, emb)
+            found[key] = emb
+
+    return [found[key] for key in keys]
+
+
+async def embed_query(text: str) -> List[float]:
+    return (await embed_texts([text]))[0]
+
+
+async def fetch_collection_ids() -> Dict[str, str]:
+    resp = await chroma_client().get(f"{chroma_services_url}/api/v1/collections")
     resp.raise_for_status()
-    for col in resp.json():
-        if col.get("name") == collection:
-            return col["id"]
-    raise runtimeerror(f"collection '{collection}' not found")
+    return {col["name"]: col["id"] for col in resp.json() if col.get("name")}
+
+
+class CollectionIdCache:
+    """
+    Caches the Chroma collection name → id mapping.
+
+    The first lookup resolves the mapping synchronously. Once an entry is
+    older than `ttl` seconds it is still served while a background task
+    refreshes the whole mapping. `invalidate()` drops it (e.g. after a 404) so
+    the next lookup resolves it again.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[Dict[str, str]]] = fetch_collection_ids,
+        ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.clock = clock
+        self._ids: Dict[str, str] = {}
+        self._fetched_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def get(self, name: str) -> str:
+        if name not in self._ids:
+            await self._refresh(force=False, name=name)
+            if name not in self._ids:
+                raise RuntimeError(f"collection '{name}' not found")
+        elif self._is_stale() and not self._refreshing():
+            self._refresh_task = asyncio.create_task(self._refresh_quietly())
+        return self._ids[name]
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        if name is None:
+            self._ids.clear()
+        else:
+            self._ids.pop(name, None)
+
+    def _is_stale(self) -> bool:
+        return self._fetched_at is None or self.clock() - self._fetched_at >= self.ttl
+
+    def _refreshing(self) -> bool:
+        return self._refresh_task is not None and not self._refresh_task.done()
+
+    async def _refresh(self, force: bool = True, name: Optional[str] = None) -> None:
+        async with self._lock:
+            # Another caller may have resolved it while we were waiting
+            if not force and name in self._ids:
+                return
+            self._ids = await self.fetch()
+            self._fetched_at = self.clock()
+
+    async def _refresh_quietly(self) -> None:
+        try:
+            await self._refresh()
+        except Exception as e:
+            # Keep serving the cached ids; the next stale lookup retries
+            logger.warning("Collection id refresh failed: %s", e)
+
+
+collection_ids = CollectionIdCache(ttl=collection_id_ttl)
+
+
+async def get_collection_id(name: str = collection) -> str:
+    return await collection_ids.get(name)
 
 def log_event(correlation_id: str, service: Dict[str, Any], req: Dict, res: Dict, reason: str = "", query: str = ""):
     event = {
@@ -190,10 +315,11 @@ def log_event(correlation_id: str, service: Dict[str, Any], req: Dict, res: Dict
         "contract_input": service["metadata"].get("contract_input"),
         "contract_output": service["metadata"].get("contract_output"),
     }
-    print(json.dumps(event) + "\n")
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-    with open(log_path, "a") as f:
-        f.write(json.dumps(event) + "\n")
+    request_spans = spans()
+    if request_spans:
+        event["spans"] = request_spans
+    with timed("log_write"):
+        trace_writer.write(event)
 
 
 
@@ -223,7 +349,7 @@ def resolve_inputs(contract_str: str, body: Dict[str, Any], previous_results: Di
             return None
 
     except Exception as e:
-        print(f"Input resolution error: {e}")
+        logger.warning("Input resolution error: %s", e)
         return None
 
 
@@ -264,10 +390,11 @@ def resolve_fields(
 def build_candidates_section(candidates: List[Dict]) -> str:
     def build_line(c):
         m = c["metadata"]
+        contract = contract_registry.get(c)
         provides = ", ".join(m.get("provides", []))
         tags     = ", ".join(m.get("tags", []))
-        inputs   = ", ".join(json.loads(m.get("contract_input", "{}")).get("properties", {}).keys())
-        outputs  = ", ".join(json.loads(m.get("contract_output", "{}")).get("properties", {}).keys())
+        inputs   = ", ".join(contract.input_fields)
+        outputs  = ", ".join(contract.output_fields)
         return (
             f"{c['id']}:\n"
             f"  description: {c['document']}\n"
@@ -280,48 +407,37 @@ def build_candidates_section(candidates: List[Dict]) -> str:
     return "\n\n".join(build_line(c) for c in candidates)
 
 
-def topo_sort_services(pickids: List[str], service_contracts: Dict[str, Dict[str, Any]], known_fields: Set[str]) -> List[str]:
-    print(f"[TOPO ORDER] pickids: '{pickids}'")
-    print(f"[TOPO ORDER] known fields: '{known_fields}'")
-
-    remaining = set(pickids)
-    order = []
-    available_fields = set(known_fields)
-
-    inputs_map = {
-        sid: set(service_contracts[sid]["input"].get("required", []))
-        for sid in pickids
-    }
-
-    outputs_map = {
-        sid: set(service_contracts[sid]["output"].get("properties", {}).keys())
-        for sid in pickids
-    }
-
-    while remaining:
-        progress = False
-        for sid in list(remaining):
-            if inputs_map[sid].issubset(available_fields):
-                order.append(sid)
-                available_fields.update(outputs_map[sid])
-                remaining.remove(sid)
-                progress = True
-
-        if not progress:
-            raise RuntimeError(f"Dependency resolution failed. Unresolved services: {remaining}. Known fields: {available_fields}")
-
+def decision_key(
+    query: str,
+    candidates: List[Dict],
+    candidates_section: str,
+    model: str,
+    *templates: str,
+) -> str:
+    """Cache key for an LLM decision over `candidates`."""
+    contracts = sorted(
+        (c["id"], c["metadata"].get("contract_input", ""), c["metadata"].get("contract_output", ""))
+        for c in candidates
+    )
+    payload = json.dumps([
+        normalize_query(query),
+        model,
+        hashlib.sha256("\0".join(templates).encode("utf-8")).hexdigest(),
+        contracts,
+        hashlib.sha256(candidates_section.encode("utf-8")).hexdigest(),
+    ])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def topo_sort_services(pickids: List[str], service_contracts: Dict[str, Contract], known_fields: Set[str]) -> List[str]:
+    logger.debug("Ordering %s with known fields %s", pickids, known_fields)
+
+    order, unresolvable = dependency_order(pickids, service_contracts, known_fields)
+    if unresolvable:
+        raise RuntimeError(f"Dependency resolution failed. Unresolved services: {unresolvable}. Known fields: {known_fields}")
     return order
 
 
 def is_resolvable(contract_input: dict, context: dict) -> bool:
-    props = contract_input.get("properties", {})
-    raw_required = contract_input.get("required")
-    required = raw_required or [
-        k for k, v in props.items()
-        if not (isinstance(v.get("type"), list) and "null" in v["type"])
-    ]
-    return all(
-        k in context and context[k] is not None and str(context[k]).lower() != "null"
-        for k in required
-    )
+    return all(has_value(context, k) for k in required_inputs(contract_input))
 
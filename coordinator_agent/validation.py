@@ -0,0 +1,80 @@
+from typing import Any, Dict, List
+
+import hashlib
+import json
+import logging
+import os
+
+from jsonschema.validators import validator_for
+
+from coordinator_agent.cache import LRUCache
+
+
+# ── config ───────────────────────────────────────────────────────────────────────
+# "strict": reject violations, "warn": log them and carry on, "off": skip validation
+VALIDATION_MODE       = os.getenv("VALIDATION_MODE", "warn")
+VALIDATOR_CACHE_SIZE  = int(os.getenv("VALIDATOR_CACHE_SIZE", "1024"))
+# ────────────────────────────────────────────────────────────────────────────────
+
+logger = logging.getLogger("coordinator")
+
+# sha256 of the canonical schema → compiled validator
+validator_cache = LRUCache(maxsize=VALIDATOR_CACHE_SIZE)
+# id(schema) → (schema, validator), so a schema object that is shared between
+# calls (contracts, merged extraction schemas) is not serialized again; the
+# entry holds the schema, which keeps its id from being reused
+validators_by_identity = LRUCache(maxsize=VALIDATOR_CACHE_SIZE)
+
+
+def schema_hash(schema: dict) -> str:
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def compile_validator(schema: dict):
+    """jsonschema validator instance for the draft `schema` declares."""
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+
+def get_validator(schema: dict):
+    """
+    Compiled validator for `schema`, built once per distinct schema.
+
+    Shared schemas must not be mutated: a schema object seen before is
+    answered by identity, without hashing its contents.
+    """
+    entry = validators_by_identity.get(id(schema))
+    if entry is not None and entry[0] is schema:
+        return entry[1]
+    key = schema_hash(schema)
+    validator = validator_cache.get(key)
+    if validator is None:
+        validator = compile_validator(schema)
+        validator_cache.set(key, validator)
+    validators_by_identity.set(id(schema), (schema, validator))
+    return validator
+
+
+def violations(validator, instance: Any) -> List[Dict[str, Any]]:
+    """All errors of `instance` as JSON-friendly {"path", "message"} entries."""
+    return [
+        {"path": "/".join(str(p) for p in error.absolute_path), "message": error.message}
+        for error in validator.iter_errors(instance)
+    ]
+
+
+def check(validator, instance: Any, what: str, mode: str = VALIDATION_MODE) -> List[Dict[str, Any]]:
+    """
+    Validate `instance` according to `mode`.
+
+    Returns the violations (empty when valid or when `mode` is "off") and
+    logs them. Acting on them in "strict" mode is up to the caller, since
+    rejecting an extraction, a request and a response each look different.
+    """
+    if mode == "off":
+        return []
+    errors = violations(validator, instance)
+    if errors:
+        logger.warning("%s violates its schema: %s", what, errors)
+    return errors
@@ -0,0 +1,205 @@
+from typing import Any, Awaitable, Callable, Dict, List
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+from coordinator_agent.clients import chroma_client
+
+
+logger = logging.getLogger("coordinator")
+
+# id → {"document": str, "metadata": dict}
+Records = Dict[str, Dict[str, Any]]
+
+
+def record_hash(document: str, metadata: Dict[str, Any]) -> str:
+    payload = json.dumps([document, metadata], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def flatten_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Same flattening the Chroma bootstrap applies (Chroma only stores scalars)."""
+    flat = {}
+    for key, value in metadata.items():
+        if isinstance(value, dict):
+            flat.update(value)
+        elif isinstance(value, list):
+            flat[key] = ",".join(map(str, value))
+        else:
+            flat[key] = value
+    return flat
+
+
+class ServiceIndex:
+    """
+    In-process copy of the service registry for top-k cosine search.
+
+    All embeddings live in one L2-normalized NumPy matrix, so a query is a
+    single matrix-vector product. `sync()` diffs the source against the
+    loaded records by content hash and only fetches embeddings for new or
+    changed services. Hits carry cosine distances (`1 - similarity`).
+    """
+
+    metric = "cosine"
+
+    def __init__(self):
+        self._ids: List[str] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._embeddings: Dict[str, np.ndarray] = {}
+        self._records: Records = {}
+        self._hashes: Dict[str, str] = {}
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], records: Records) -> None:
+        for sid, emb in zip(ids, embeddings):
+            vec = np.asarray(emb, dtype=np.float32)
+            norm = np.linalg.norm(vec)
+            self._embeddings[sid] = vec / norm if norm else vec
+            self._records[sid] = records[sid]
+            self._hashes[sid] = record_hash(records[sid]["document"], records[sid]["metadata"])
+        self._rebuild()
+
+    def remove(self, ids: List[str]) -> None:
+        for sid in ids:
+            self._embeddings.pop(sid, None)
+            self._records.pop(sid, None)
+            self._hashes.pop(sid, None)
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        ids = list(self._embeddings)
+        # Swap both references at once so concurrent queries see a consistent pair
+        matrix = np.vstack([self._embeddings[sid] for sid in ids]) if ids else np.zeros((0, 0), dtype=np.float32)
+        self._ids, self._matrix = ids, matrix
+
+    def query(self, embedding: List[float], k: int = 5) -> List[Dict[str, Any]]:
+        return self.query_many([embedding], k)[0]
+
+    def query_many(self, embeddings: List[List[float]], k: int = 5) -> List[List[Dict[str, Any]]]:
+        ids, matrix = self._ids, self._matrix
+        if not ids or k <= 0:
+            return [[] for _ in embeddings]
+        queries = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+        scores = queries @ matrix.T
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        top = np.take_along_axis(top, np.argsort(-top_scores, axis=1), axis=1)
+        return [
+            [
+                {
+                    "id": ids[i],
+                    "metadata": self._records[ids[i]]["metadata"],
+                    "distance": float(1.0 - row_scores[i]),
+                    "metric": self.metric,
+                }
+                for i in row
+            ]
+            for row, row_scores in zip(top, scores)
+        ]
+
+    async def sync(
+        self,
+        list_records: Callable[[], Awaitable[Records]],
+        fetch_embeddings: Callable[[List[str], Records], Awaitable[List[List[float]]]],
+    ) -> Dict[str, int]:
+        """Bring the index in line with the source; returns what changed."""
+        async with self._lock:
+            records = await list_records()
+            changed = [
+                sid for sid, rec in records.items()
+                if self._hashes.get(sid) != record_hash(rec["document"], rec["metadata"])
+            ]
+            removed = [sid for sid in self._records if sid not in records]
+
+            if changed:
+                embeddings = await fetch_embeddings(changed, records)
+                self.upsert(changed, embeddings, records)
+            if removed:
+                self.remove(removed)
+
+        if changed or removed:
+            logger.info("Service index synced: %d upserted, %d removed, %d total", len(changed), len(removed), len(self))
+        return {"upserted": len(changed), "removed": len(removed), "total": len(self)}
+
+
+class ChromaSource:
+    """Reads the registry straight out of the Chroma collection."""
+
+    def __init__(self, base_url: str, get_collection_id: Callable[[], Awaitable[str]]):
+        self.base_url = base_url
+        self.get_collection_id = get_collection_id
+
+    async def _get(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        coll_id = await self.get_collection_id()
+        r = await chroma_client().post(f"{self.base_url}/api/v1/collections/{coll_id}/get", json=payload)
+        r.raise_for_status()
+        return r.json()
+
+    async def list_records(self) -> Records:
+        data = await self._get({"include": ["documents", "metadatas"]})
+        return {
+            sid: {"document": doc or "", "metadata": meta or {}}
+            for sid, doc, meta in zip(data["ids"], data["documents"], data["metadatas"])
+        }
+
+    async def fetch_embeddings(self, ids: List[str], records: Records) -> List[List[float]]:
+        data = await self._get({"ids": ids, "include": ["embeddings"]})
+        by_id = dict(zip(data["ids"], data["embeddings"]))
+        return [by_id[sid] for sid in ids]
+
+
+class BootstrapSource:
+    """
+    Reads the registry from the bootstrap JSON files.
+
+    Documents are embedded with `embed` (the coordinator's `embed_texts`),
+    which batches, orders and caches the embeddings requests.
+    """
+
+    def __init__(self, source_dir: str, embed: Callable[[List[str]], Awaitable[List[List[float]]]]):
+        self.source_dir = source_dir
+        self.embed = embed
+
+    async def list_records(self) -> Records:
+        records: Records = {}
+        for file in sorted(os.listdir(self.source_dir)):
+            if not file.endswith(".json"):
+                continue
+            with open(os.path.join(self.source_dir, file), "r", encoding="utf-8") as f:
+                doc = json.load(f)
+            if "id" not in doc:
+                continue
+            records[doc["id"]] = {
+                "document": doc.get("document", ""),
+                "metadata": flatten_metadata(doc.get("metadata", {})),
+            }
+        return records
+
+    async def fetch_embeddings(self, ids: List[str], records: Records) -> List[List[float]]:
+        return await self.embed([records[sid]["document"] for sid in ids])
+
+
+async def sync_forever(index: ServiceIndex, source: Any, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await index.sync(source.list_records, source.fetch_embeddings)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Service index sync failed: %s", e)
@@ -5,8 +5,17 @@ import os
 import json
 from datetime import datetime
 
+from common.fixtures import Fixture
+from common.trace_writer import get_trace_writer
+
 app = FastAPI()
-LOG_PATH = "/shared/logs/trace.log"
+trace_writer = get_trace_writer()
+
+# customer id → customer, reloaded when fixture.json changes
+customers = Fixture(
+    os.path.join(os.path.dirname(__file__), "fixture.json"),
+    lambda data: {int(c["id"]): c for c in data["customers"]},
+)
 
 def log_event(service: str, correlation_id: str, request_data: dict, response_data: dict, jwt: dict):
     event = {
@@ -17,10 +26,7 @@ def log_event(service: str, correlation_id: str, request_data: dict, response_da
         "request": request_data,
         "response": response_data
     }
-    print(json.dumps(event) + "\n")
-    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
-    with open(LOG_PATH, "a") as log_file:
-        log_file.write(json.dumps(event) + "\n")
+    trace_writer.write(event)
 
 class CustomerResponse(BaseModel):
     customer_tier: str
@@ -29,11 +35,7 @@ class CustomerResponse(BaseModel):
 
 @app.post("/customer/{customer_id}")
 async def get_customer(customer_id: int):
-    # Load all fixtures
-    with open("fixture.json", "r") as f:
-        all_data = json.load(f)
-
-    customer = next((c for c in all_data["customers"] if int(c["id"]) == customer_id), None)
+    customer = customers.data.get(customer_id)
 
     if not customer:
         return {"error": "Customer not found"}
@@ -4,8 +4,10 @@ from typing import Dict
 from datetime import datetime
 import os, json
 
+from common.trace_writer import get_trace_writer
+
 app = FastAPI()
-LOG_PATH = "/shared/logs/trace.log"
+trace_writer = get_trace_writer()
 
 # Define input model
 class InsuranceRequest(BaseModel):
@@ -35,10 +37,7 @@ def log_event(service: str, correlation_id: str, request_data: dict, response_da
         "request": request_data,
         "response": response_data
     }
-    print(json.dumps(event) + "\n")
-    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
-    with open(LOG_PATH, "a") as f:
-        f.write(json.dumps(event) + "\n")
+    trace_writer.write(event)
 
 @app.post("/insurance")
 async def get_insurance(req: InsuranceRequest, request: Request):
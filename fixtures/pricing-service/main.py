@@ -4,9 +4,25 @@ from typing import Dict
 import os, json
 from datetime import datetime
 
+from common.fixtures import Fixture
+from common.trace_writer import get_trace_writer
+
 app = FastAPI()
 
-LOG_PATH = "/shared/logs/trace.log"
+trace_writer = get_trace_writer()
+
+# lowercased vehicle type → price entry, reloaded when fixture.json changes
+prices = Fixture(
+    os.path.join(os.path.dirname(__file__), "fixture.json"),
+    lambda data: {item["type"].lower(): item for item in data},
+)
+
+tier_multiplier = {
+    "platinum": 0.5,
+    "gold": 0.7,
+    "premium": 0.8,
+    "under_18": 1.2
+}
 
 class PricingRequest(BaseModel):
     vehicle_type: str
@@ -21,35 +37,21 @@ def log_event(service: str, correlation_id: str, request_data: dict, response_da
         "request": request_data,
         "response": response_data
     }
-    print(json.dumps(event) + "\n")
-    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
-    with open(LOG_PATH, "a") as f:
-        f.write(json.dumps(event) + "\n")
+    trace_writer.write(event)
 
 @app.post("/pricing")
 async def get_pricing(req: PricingRequest, request: Request):
     correlation_id = request.headers.get("X-Correlation-ID", "none")
     fake_jwt = json.loads(request.headers.get("X-JWT", "{}"))
 
-    # Load fixture
-    fixture_path = os.path.join(os.path.dirname(__file__), "fixture.json")
-    with open(fixture_path, "r") as f:
-        fixture = json.load(f)
-
     # Find base price for vehicle type
-    match = next((item for item in fixture if item["type"].lower() == req.vehicle_type.lower()), None)
+    match = prices.data.get(req.vehicle_type.lower())
     if not match:
         return {"error": f"vehicle type '{req.vehicle_type}' not found in fixture"}
 
     base_price = match["base_price"]
 
     # Determine multiplier
-    tier_multiplier = {
-        "platinum": 0.5,
-        "gold": 0.7,
-        "premium": 0.8,
-        "under_18": 1.2
-    }
     multiplier = tier_multiplier.get(req.customer_tier.lower(), 1.0)
 
     total_price = 1 * base_price * multiplier
@@ -6,9 +6,15 @@ import json
 from datetime import datetime
 from typing import List
 
+from common.fixtures import Fixture
+from common.trace_writer import get_trace_writer
+
 app = FastAPI()
 
-LOG_PATH = "/shared/logs/trace.log"
+trace_writer = get_trace_writer()
+
+# vehicle list, reloaded when fixture.json changes
+vehicles = Fixture(os.path.join(os.path.dirname(__file__), "fixture.json"), list)
 
 def log_event(service: str, correlation_id: str, request_data: dict, response_data: dict, jwt: dict):
     event = {
@@ -19,10 +25,7 @@ def log_event(service: str, correlation_id: str, request_data: dict, response_da
         "request": request_data,
         "response": response_data
     }
-    print(json.dumps(event) + "\n")
-    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
-    with open(LOG_PATH, "a") as log_file:
-        log_file.write(json.dumps(event) + "\n")
+    trace_writer.write(event)
 
 class RentalRequest(BaseModel):
     location: str
@@ -34,13 +37,10 @@ async def check_availability(req: RentalRequest, request: Request):
     correlation_id = request.headers.get("X-Correlation-ID", "none")
     fake_jwt = json.loads(request.headers.get("X-JWT", "{}"))
 
-    path = os.path.join(os.path.dirname(__file__), "fixture.json")
-    with open(path, "r") as f:
-        vehicles = json.load(f)
-
+    available = vehicles.data
 
-    log_event("rental-service", correlation_id, req.dict(), vehicles, fake_jwt)
-    return { "vehicles": vehicles }
+    log_event("rental-service", correlation_id, req.dict(), available, fake_jwt)
+    return { "vehicles": available }
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000)
@@ -19,59 +19,87 @@ export default function TraceViewer() {
     "rental-service": "bg-pink-100 text-pink-800",
   };
 
-  const fetchLogs = useCallback(() => {
-    fetch("/api/logs")
-      .then((res) => res.text())
-      .then((text) => {
-        const lines = text
-          .split("\n")
-          .filter(Boolean)
-          .map((line) => {
-            try {
-              return JSON.parse(line);
-            } catch {
-              return null;
-            }
-          })
-          .filter(Boolean);
-
-        const uniqueIds = [...new Set(lines.map((l) => l.correlation_id))].slice(-5).reverse();
-        setAvailableIds(uniqueIds);
+  const fetchIds = useCallback(async () => {
+    try {
+      // Latest correlation ids come from the indexed trace store, not the raw log file
+      const uniqueIds = await fetch("/api/traces/correlations?limit=5").then((res) => res.json());
+      setAvailableIds(uniqueIds);
+      setSelectedId((current) => current || uniqueIds[0] || "");
+    } catch (err) {
+      setError(err.toString());
+    }
+  }, []);
 
-        if (!selectedId && uniqueIds.length > 0) {
-          setSelectedId(uniqueIds[0]);
-        }
+  useEffect(() => {
+    fetchIds();
+    if (autoRefresh) {
+      const interval = setInterval(fetchIds, 3000);
+      return () => clearInterval(interval);
+    }
+  }, [fetchIds, autoRefresh]);
 
-        const filtered = lines
-          .filter((entry) => entry.correlation_id === selectedId)
-          .sort((a, b) => new Date(a.timestamp) - new Date(b.timestamp));
+  const appendLogs = useCallback((events) => {
+    setLogs((current) => {
+      const seen = new Set(current.map((l) => l._cursor));
+      const merged = [...current, ...events.filter((e) => !seen.has(e._cursor))];
+      return merged.sort((a, b) => new Date(a.timestamp) - new Date(b.timestamp));
+    });
+  }, []);
 
-        setLogs(filtered);
+  useEffect(() => {
+    setLogs([]);
+    if (!selectedId) return;
 
-        const coordinatorLogs = filtered.filter((l) => l.service === "coordinator-agent");
+    if (autoRefresh) {
+      // The stream replays the request's existing events, then pushes new ones as they land
+      const source = new EventSource(
+        `/api/traces/stream?correlation_id=${encodeURIComponent(selectedId)}`
+      );
+      source.onmessage = (msg) => {
+        try {
+          appendLogs([JSON.parse(msg.data)]);
+        } catch {
+          // ignore malformed events
+        }
+      };
+      return () => source.close();
+    }
 
-        // Extract the first available query
-        const extractedQuery = coordinatorLogs.find((l) => l.query)?.query || "";
+    // Auto-refresh off: load a one-off snapshot, page by page
+    let cancelled = false;
+    (async () => {
+      try {
+        let cursor = 0;
+        while (cursor !== null && !cancelled) {
+          const page = await fetch(
+            `/api/traces?correlation_id=${encodeURIComponent(selectedId)}&cursor=${cursor}&limit=500`
+          ).then((res) => res.json());
+          appendLogs(page.events);
+          cursor = page.next_cursor;
+        }
+      } catch (err) {
+        setError(err.toString());
+      }
+    })();
+    return () => {
+      cancelled = true;
+    };
+  }, [selectedId, autoRefresh, appendLogs]);
 
-        // Extract all distinct services mentioned as `target_service`
-        const extractedServices = [
-          ...new Set(coordinatorLogs.map((l) => l.target_service).filter(Boolean))
-        ];
+  useEffect(() => {
+    const coordinatorLogs = logs.filter((l) => l.service === "coordinator-agent");
 
-        setUserQuery(extractedQuery);
-        setPlannedServices(extractedServices);
+    // Extract the first available query
+    const extractedQuery = coordinatorLogs.find((l) => l.query)?.query || "";
 
-      })
-      .catch((err) => setError(err.toString()));
-  }, [selectedId]);
+    // Extract all distinct services mentioned as `target_service`
+    const extractedServices = [
+      ...new Set(coordinatorLogs.map((l) => l.target_service).filter(Boolean))
+    ];
 
-  useEffect(() => {
-    fetchLogs();
-    if (autoRefresh) {
-      const interval = setInterval(fetchLogs, 3000);
-      return () => clearInterval(interval);
-    }
-  }, [fetchLogs, autoRefresh]);
+    setUserQuery(extractedQuery);
+    setPlannedServices(extractedServices);
+  }, [logs]);
 
   const diagramContent = useMemo(() => {
     return `sequenceDiagram
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+# coordinator_agent.utils reads its config (and opens the trace writer) at import time
+os.environ.setdefault("LMSTUDIO_URL", "http://lmstudio.invalid")
+os.environ.setdefault("TRACE_LOG_PATH", os.path.join(tempfile.mkdtemp(), "trace.log"))
+os.environ.setdefault("TRACE_DB_PATH", "")
+
+from coordinator_agent.utils import CollectionIdCache  # noqa: E402
+
+
+class FakeChroma:
+    """`fetch` stand-in: returns the current mapping and counts calls."""
+
+    def __init__(self, ids):
+        self.ids = dict(ids)
+        self.calls = 0
+        self.release = None  # set to an asyncio.Event to hold fetches
+
+    async def fetch(self):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        return dict(self.ids)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_first_lookup_resolves_and_is_cached():
+    async def scenario():
+        chroma = FakeChroma({"services": "id-1"})
+        cache = CollectionIdCache(fetch=chroma.fetch, ttl=60, clock=Clock())
+
+        assert await cache.get("services") == "id-1"
+        assert await cache.get("services") == "id-1"
+        assert chroma.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_stale_entry_is_served_while_refreshing():
+    async def scenario():
+        chroma = FakeChroma({"services": "id-1"})
+        clock = Clock()
+        cache = CollectionIdCache(fetch=chroma.fetch, ttl=60, clock=clock)
+        await cache.get("services")
+
+        chroma.ids["services"] = "id-2"
+        chroma.release = asyncio.Event()
+        clock.now = 61
+
+        # Stale: the old id comes back at once and one refresh starts
+        assert await cache.get("services") == "id-1"
+        assert await cache.get("services") == "id-1"
+        await asyncio.sleep(0)
+        assert chroma.calls == 2
+
+        chroma.release.set()
+        await cache._refresh_task
+        assert await cache.get("services") == "id-2"
+        assert chroma.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_failed_background_refresh_keeps_serving():
+    async def scenario():
+        chroma = FakeChroma({"services": "id-1"})
+        clock = Clock()
+        cache = CollectionIdCache(fetch=chroma.fetch, ttl=60, clock=clock)
+        await cache.get("services")
+
+        async def broken():
+            raise ConnectionError("chroma down")
+
+        cache.fetch = broken
+        clock.now = 61
+        assert await cache.get("services") == "id-1"
+        await cache._refresh_task
+        assert await cache.get("services") == "id-1"
+
+    asyncio.run(scenario())
+
+
+def test_invalidate_forces_refetch():
+    async def scenario():
+        chroma = FakeChroma({"services": "id-1"})
+        cache = CollectionIdCache(fetch=chroma.fetch, ttl=60, clock=Clock())
+        await cache.get("services")
+
+        # Collection recreated under a new id; the caller saw a 404
+        chroma.ids["services"] = "id-2"
+        cache.invalidate("services")
+        assert await cache.get("services") == "id-2"
+        assert chroma.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_unknown_name_raises():
+    async def scenario():
+        chroma = FakeChroma({"services": "id-1"})
+        cache = CollectionIdCache(fetch=chroma.fetch, ttl=60, clock=Clock())
+
+        with pytest.raises(RuntimeError, match="collection 'agents' not found"):
+            await cache.get("agents")
+
+    asyncio.run(scenario())